@@ -1,19 +1,47 @@
 import streamlit as st
 import pandas as pd
-from PIL import Image
+from PIL import Image, ImageDraw
 import base64
-from io import BytesIO
+import json
+import logging
 import os
 import math
+import numpy as np
 import requests
-from supabase import create_client
+import httpx
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from supabase import create_client, ClientOptions
 from collections import defaultdict
-from pathlib import Path
 from streamlit_cookies_manager import EncryptedCookieManager
 import time
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+import metrics
+from catalog import CATALOG_ARROW, CATALOG_CSV, FilterIndex, read_catalog
+from images import IMAGE_WIDTHS, SRCSET_VARIANTS, ImageCache, ImageManifest, build_manifest, source_for
+
+APP_ENV = os.environ.get("APP_ENV", "prod")
+
+# Laufzeit-Metriken (APP_METRICS=log,prometheus, siehe metrics.py): ein Rerun vom
+# Skriptstart bis zum Ende; per st.stop()/st.rerun() abgebrochene Reruns werden beim
+# nächsten Rerun der Session als outcome=stop abgeschlossen.
+if metrics.ENABLED:
+    _unfinished_rerun = st.session_state.pop("metrics_rerun", None)
+    if _unfinished_rerun is not None:
+        _unfinished_rerun.finish("stop")
+    st.session_state["metrics_rerun"] = metrics.start_rerun()
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "").rstrip("/")
 SUPABASE_ANON_KEY = os.environ.get("SUPABASE_ANON_KEY", "")
+# Optional: JWT-Secret des Projekts (HS256) -> User beim Cookie-Restore aus den geprüften Token-Claims
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET", "")
 
 COOKIE_SECRET = os.environ.get("COOKIE_SECRET", "")
 if not COOKIE_SECRET:
@@ -33,13 +61,50 @@ if "sb_session" not in st.session_state:
     st.session_state["sb_session"] = None
 if "sb_user" not in st.session_state:
     st.session_state["sb_user"] = None
+if "sb_refresh_lock" not in st.session_state:
+    # ein Token-Refresh pro Session zur Zeit (siehe silent_refresh)
+    st.session_state["sb_refresh_lock"] = threading.Lock()
+
+# HTTP-Verbindungen zu Supabase (prozessweit geteilt, Keep-Alive)
+HTTP_TIMEOUT = 30
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "20"))
+
+@st.cache_resource
+def http() -> requests.Session:
+    """
+    Prozessweite requests.Session für alle Supabase REST/Auth/Functions Calls:
+    - Connection-Pool + Keep-Alive -> kein neuer TCP/TLS-Handshake pro Call
+    - Retry mit Backoff bei Verbindungsfehlern und 502/503/504, Status-Retries
+      nur für idempotente Methoden (POST wird nie doppelt abgeschickt)
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    # misst Latenz + Status jedes Requests, wenn APP_METRICS gesetzt ist
+    session = metrics.TimedSession()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Session wird von allen Usern geteilt -> niemals Cookies mitführen
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
 
 @st.cache_resource
 def sb():
     """Supabase Client (anon key). Für Auth-Calls ok; DB-RLS greift über User-Token bei REST-Calls."""
     if not SUPABASE_URL or not SUPABASE_ANON_KEY:
         raise RuntimeError("SUPABASE_URL / SUPABASE_ANON_KEY fehlt in den Env Vars")
-    return create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+    # supabase-py spricht httpx statt requests -> eigener, aber ebenfalls gepoolter Client
+    httpx_client = httpx.Client(
+        timeout=HTTP_TIMEOUT,
+        limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, keepalive_expiry=60),
+        event_hooks=metrics.httpx_event_hooks(),
+    )
+    return create_client(SUPABASE_URL, SUPABASE_ANON_KEY, options=ClientOptions(httpx_client=httpx_client))
 
 def _auth_headers(access_token: str | None = None) -> dict:
     h = {"apikey": SUPABASE_ANON_KEY, "Content-Type": "application/json"}
@@ -53,29 +118,120 @@ def refresh_session_with_token(refresh_token: str) -> dict:
     Tauscht refresh_token -> neues access_token (und evtl. neues refresh_token).
     """
     url = f"{SUPABASE_URL}/auth/v1/token?grant_type=refresh_token"
-    r = requests.post(
+    r = http().post(
         url,
         headers=_auth_headers(),
         json={"refresh_token": refresh_token},
-        timeout=30,
+        timeout=HTTP_TIMEOUT,
     )
     r.raise_for_status()
     return r.json()
 
-def silent_refresh() -> bool:
+# Access-Token so lange vor Ablauf (exp) proaktiv erneuern, statt erst nach einem 401
+TOKEN_REFRESH_MARGIN_SEC = 60
+
+def _jwt_claims(token: str | None) -> dict:
+    """Claims eines JWT ohne Signaturprüfung (nur um exp des eigenen Tokens zu lesen)."""
+    try:
+        payload = token.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (AttributeError, IndexError, ValueError):
+        return {}
+
+def _verified_jwt_claims(token: str | None) -> dict:
+    """Claims eines mit SUPABASE_JWT_SECRET signierten, nicht abgelaufenen Tokens, sonst {}."""
+    if not SUPABASE_JWT_SECRET or not token:
+        return {}
+    try:
+        header, payload, sig = token.split(".")
+        if json.loads(base64.urlsafe_b64decode(header + "=" * (-len(header) % 4))).get("alg") != "HS256":
+            return {}
+        expected = hmac.new(SUPABASE_JWT_SECRET.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(base64.urlsafe_b64decode(sig + "=" * (-len(sig) % 4)), expected):
+            return {}
+    except ValueError:
+        return {}
+    claims = _jwt_claims(token)
+    return claims if claims.get("exp", 0) > time.time() else {}
+
+def _user_from_token_data(token_data: dict) -> dict | None:
     """
-    Erneuert das access_token mit dem refresh_token (ohne dass der User was merkt).
-    Returns True, wenn erfolgreich erneuert.
+    User (id, email) direkt aus der Antwort von /auth/v1/token, ohne weiteren Request:
+    1. "user" der Antwort (GoTrue liefert ihn mit; muss zum sub des Tokens passen)
+    2. geprüfte Claims des access_token (nur mit SUPABASE_JWT_SECRET)
+    Returns None, wenn beides nicht geht -> fetch_user().
     """
+    sub = _jwt_claims(token_data.get("access_token")).get("sub")
+    user = token_data.get("user") or {}
+    if user.get("id") and (sub is None or user["id"] == sub):
+        return {"id": user["id"], "email": user.get("email")}
+    claims = _verified_jwt_claims(token_data.get("access_token"))
+    if claims.get("sub"):
+        return {"id": claims["sub"], "email": claims.get("email")}
+    return None
+
+def _session_value(name: str):
+    """Feld der Session – dict (Cookie-Restore/Refresh) oder Supabase Session Objekt (nach Login)."""
     sess = st.session_state.get("sb_session") or {}
-    rt = None
-
-    # Session kann dict (Cookie-Restore) oder Supabase Session Objekt (nach Login) sein
     if isinstance(sess, dict):
-        rt = sess.get("refresh_token")
-    else:
-        rt = getattr(sess, "refresh_token", None)
+        return sess.get(name)
+    return getattr(sess, name, None)
+
+def _session_from_token_data(token_data: dict, refresh_token: str) -> dict:
+    """Session-dict aus der Antwort von /auth/v1/token (refresh_token kann rotieren)."""
+    access_token = token_data.get("access_token")
+    return {
+        "access_token": access_token,
+        "refresh_token": token_data.get("refresh_token") or refresh_token,
+        "expires_at": token_data.get("expires_at") or _jwt_claims(access_token).get("exp"),
+    }
+
+def token_expires_at() -> float | None:
+    """Ablauf des access_token (Unix-Zeit) aus expires_at der Session, sonst aus dem exp-Claim."""
+    expires_at = _session_value("expires_at") or _jwt_claims(_session_value("access_token")).get("exp")
+    return float(expires_at) if expires_at else None
+
+def ensure_fresh_token() -> None:
+    """
+    Erneuert das access_token, wenn es in weniger als TOKEN_REFRESH_MARGIN_SEC abläuft.
+    Ist der Refresh für dieses Token schon einmal fehlgeschlagen (sb_refresh_failed_for),
+    wird es nicht bei jedem Request erneut versucht – dann bleibt nur der 401-Pfad.
+    """
+    expires_at = token_expires_at()
+    if expires_at is not None and expires_at - time.time() < TOKEN_REFRESH_MARGIN_SEC:
+        access_token = _session_value("access_token")
+        if access_token and access_token == st.session_state.get("sb_refresh_failed_for"):
+            return
+        # schlägt der Refresh fehl, läuft der Request mit dem alten Token (-> 401-Pfad)
+        silent_refresh(stale_token=access_token)
+
+def silent_refresh(stale_token: str | None = None) -> bool:
+    """
+    Erneuert das access_token mit dem refresh_token (ohne dass der User was merkt).
+    Single-Flight pro Session: gleichzeitige Aufrufe warten auf den laufenden Refresh;
+    wurde stale_token inzwischen schon ersetzt, gibt es keinen zweiten Call an
+    /auth/v1/token (das refresh_token rotiert und wäre danach ohnehin verbraucht).
+    Genauso bei Fehlern: ist der Refresh für stale_token fehlgeschlagen, während dieser
+    Aufruf gewartet hat, gibt es keinen zweiten Versuch.
+    Returns True, wenn (von diesem oder einem anderen Aufruf) erfolgreich erneuert.
+    """
+    failed_before = st.session_state.get("sb_refresh_failed_for")
+    with st.session_state["sb_refresh_lock"]:
+        current = _session_value("access_token")
+        if stale_token is not None and current and current != stale_token:
+            return True
+        failed_for = st.session_state.get("sb_refresh_failed_for")
+        if stale_token is not None and failed_for == stale_token and failed_for != failed_before:
+            return False
 
+        if not _refresh_access_token():
+            st.session_state["sb_refresh_failed_for"] = current
+            return False
+        return True
+
+def _refresh_access_token() -> bool:
+    """Ein Call an /auth/v1/token; neue Session in den Session-State, refresh_token ins Cookie."""
+    rt = _session_value("refresh_token")
     if not rt:
         # Fallback: Cookie
         rt = cookies.get("refresh_token")
@@ -85,19 +241,15 @@ def silent_refresh() -> bool:
 
     try:
         token_data = refresh_session_with_token(rt)
-        access_token = token_data.get("access_token")
-        new_refresh = token_data.get("refresh_token") or rt
-        if not access_token:
+        if not token_data.get("access_token"):
             return False
 
         # Session-State aktualisieren (wir arbeiten hier bewusst mit dict)
-        st.session_state["sb_session"] = {
-            "access_token": access_token,
-            "refresh_token": new_refresh,
-        }
+        session = _session_from_token_data(token_data, rt)
+        st.session_state["sb_session"] = session
 
         # refresh_token kann rotieren -> Cookie aktualisieren
-        cookies["refresh_token"] = new_refresh
+        cookies["refresh_token"] = session["refresh_token"]
         cookies.save()
         return True
     except Exception:
@@ -106,21 +258,22 @@ def silent_refresh() -> bool:
 def _sb_request(method: str, url: str, *, headers: dict | None = None, **kwargs) -> requests.Response:
     """
     Wrapper für Supabase REST/Functions Calls:
-    - macht den Request
+    - macht den Request (Token läuft bald ab -> schon vorher erneuert, siehe _sb_headers_user)
     - wenn 401: versucht silent_refresh() und wiederholt den Request genau 1x
     """
     if headers is None:
         headers = _sb_headers_user()
 
-    r = requests.request(method, url, headers=headers, timeout=30, **kwargs)
+    r = http().request(method, url, headers=headers, timeout=HTTP_TIMEOUT, **kwargs)
 
     if r.status_code != 401:
         return r
 
-    # 401 => access_token abgelaufen? -> refresh -> retry einmal
-    if silent_refresh():
-        headers2 = _sb_headers_user()
-        return requests.request(method, url, headers=headers2, timeout=30, **kwargs)
+    # 401 => access_token abgelaufen? -> refresh (falls nicht schon jemand anderes) -> retry einmal
+    if silent_refresh(stale_token=headers.get("Authorization", "").removeprefix("Bearer ")):
+        # zusätzliche Header (Prefer, Range, ...) behalten, nur Auth erneuern
+        headers2 = headers | _sb_headers_user()
+        return http().request(method, url, headers=headers2, timeout=HTTP_TIMEOUT, **kwargs)
 
     return r
 
@@ -130,7 +283,7 @@ def fetch_user(access_token: str) -> dict:
     Holt User-Objekt über Supabase Auth REST.
     """
     url = f"{SUPABASE_URL}/auth/v1/user"
-    r = requests.get(url, headers=_auth_headers(access_token), timeout=30)
+    r = http().get(url, headers=_auth_headers(access_token), timeout=HTTP_TIMEOUT)
     r.raise_for_status()
     return r.json()
 
@@ -138,7 +291,7 @@ def fetch_user(access_token: str) -> dict:
 def try_restore_login_from_cookie() -> bool:
     """
     Versucht beim App-Start automatisch einzuloggen:
-    Cookie refresh_token -> neues access_token -> user holen.
+    Cookie refresh_token -> neues access_token (+ user aus derselben Antwort, sonst user holen).
     Speichert alles in st.session_state.
     """
     # Wenn schon eingeloggt, fertig
@@ -152,22 +305,22 @@ def try_restore_login_from_cookie() -> bool:
     try:
         token_data = refresh_session_with_token(rt)
         access_token = token_data.get("access_token")
-        new_refresh = token_data.get("refresh_token") or rt
         if not access_token:
             raise RuntimeError(f"refresh_session: kein access_token erhalten: {token_data}")
 
-        user_data = fetch_user(access_token)
+        user = _user_from_token_data(token_data)
+        if user is None:
+            user_data = fetch_user(access_token)
+            user = {
+                "id": user_data.get("id"),
+                "email": user_data.get("email"),
+            }
 
-        st.session_state["sb_session"] = {
-            "access_token": access_token,
-            "refresh_token": new_refresh,
-        }
-        st.session_state["sb_user"] = {
-            "id": user_data.get("id"),
-            "email": user_data.get("email"),
-        }
+        session = _session_from_token_data(token_data, rt)
+        st.session_state["sb_session"] = session
+        st.session_state["sb_user"] = user
 
-        cookies["refresh_token"] = new_refresh
+        cookies["refresh_token"] = session["refresh_token"]
         cookies.save()
         st.session_state["just_logged_in"] = True
         st.session_state["filters_restored_this_login"] = False
@@ -247,34 +400,60 @@ def auth_gate():
 
     st.stop()
 
+def logout():
+    """Abmelden: Supabase-Session beenden, User-Daten aus dem Session-State, Cookie löschen."""
+    try:
+        sb().auth.sign_out()
+    except Exception:
+        pass
+    st.session_state["sb_session"] = None
+    st.session_state["sb_user"] = None
+    invalidate_user_plan()
+    # alles, was zum User gehört (inkl. Server-Kennzahlen: deren Memo-Key kennt den User nicht)
+    for key in (
+        "besitz", "besitz_pending", "besitz_pending_since", "besitz_sync_error", "besitz_sync_failures",
+        "besitz_retry_at", "owned_mask", "besitz_hwm", "besitz_synced_at",
+        "server_stats_memo", "besitz_server_version", "bulk_remove_confirm", "bulk_result", "bulk_error",
+        "sb_refresh_failed_for",
+    ):
+        st.session_state.pop(key, None)
+    # Cookie löschen
+    try:
+        cookies.pop("refresh_token", None)
+        cookies.save()
+    except Exception:
+        pass
+    st.rerun()
+
 def logout_ui():
     u = st.session_state.get("sb_user")
     col1, col2 = st.columns([1, 3])
+    unsaved = 0
     with col1:
         if st.button("Logout", key="btn_logout"):
-            try:
-                sb().auth.sign_out()
-            except Exception:
-                pass
-            st.session_state["sb_session"] = None
-            st.session_state["sb_user"] = None
-            # Cookie löschen
-            try:
-                cookies.pop("refresh_token", None)
-                cookies.save()
-            except Exception:
-                pass
-            st.rerun()
+            # offene Besitz-Änderungen nicht verlieren: schlägt der letzte Sync fehl,
+            # bleibt die Queue erhalten und der User eingeloggt
+            uid = u.get("id") if isinstance(u, dict) else getattr(u, "id", None)
+            if uid and not flush_besitz_changes(uid, force=True):
+                unsaved = len(st.session_state.get("besitz_pending") or {})
+            else:
+                logout()
     with col2:
         if u:
             email = u.get("email") if isinstance(u, dict) else getattr(u, "email", "")
             st.caption(f"Eingeloggt als: {email}")
+    if unsaved:
+        st.warning(
+            f"Logout abgebrochen: {unsaved} Besitz-Änderung(en) konnten nicht gespeichert werden "
+            f"({st.session_state.get('besitz_sync_error')}). Bitte gleich noch einmal versuchen."
+        )
 
 def _sb_headers_user():
     """Headers für Supabase REST-Aufrufe im Kontext des eingeloggten Users."""
     if not SUPABASE_URL or not SUPABASE_ANON_KEY:
         raise RuntimeError("SUPABASE_URL / SUPABASE_ANON_KEY fehlt in den Env Vars")
 
+    ensure_fresh_token()
     sess = st.session_state.get("sb_session")
     access_token = None
 
@@ -329,72 +508,918 @@ def create_stripe_checkout_url(app_id: str = "pika", plan_key: str = "pro_lifeti
     return url
 
 
+# Bild-Cache für den Data-URL-Fallback: Byte-Budget im Speicher (LRU) + Festplatte
+IMAGE_CACHE_MAX_MB = int(os.environ.get("IMAGE_CACHE_MAX_MB", "64"))
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", ".cache/images")
+IMAGE_CACHE_DISK_MAX_MB = int(os.environ.get("IMAGE_CACHE_DISK_MAX_MB", "256"))
+
+@st.cache_resource
+def image_cache() -> ImageCache:
+    """Prozessweiter, größenbegrenzter Bild-Cache (leeres IMAGE_CACHE_DIR = ohne Festplatte)."""
+    return ImageCache(
+        IMAGE_CACHE_MAX_MB * 1024 * 1024,
+        disk_dir=IMAGE_CACHE_DIR or None,
+        on_lookup=metrics.image_lookup if metrics.ENABLED else None,
+        disk_max_bytes=IMAGE_CACHE_DISK_MAX_MB * 1024 * 1024,
+    )
+
+def _image_cache_samples() -> list[tuple]:
+    stats = image_cache().stats()
+    return [
+        ("pika_image_cache_bytes", "gauge", "Belegter Speicher des Bild-Caches", stats["bytes"]),
+        ("pika_image_cache_entries", "gauge", "Einträge im Bild-Cache (Speicher)", stats["entries"]),
+        ("pika_image_cache_evictions_total", "counter", "Verdrängte Einträge (Speicher) seit Prozessstart", stats["evictions"]),
+        ("pika_image_cache_disk_evictions_total", "counter", "Gelöschte Dateien (Festplatte) seit Prozessstart", stats["disk_evictions"]),
+        ("pika_image_cache_hit_rate", "gauge", "Trefferquote (Speicher + Festplatte) seit Prozessstart", stats["hit_rate"]),
+    ]
+
+@st.cache_resource
+def metrics_server():
+    """/metrics-Endpunkt für Prometheus (einmal pro Prozess, METRICS_PORT; None bei belegtem Port)."""
+    metrics.registry.add_collector(_image_cache_samples)
+    return metrics.serve()
+
+if "prometheus" in metrics.METRICS_MODES:
+    metrics_server()
+
 # Funktion, um lokale PNG in base64 Data-URL zu verwandeln
-@st.cache_data(show_spinner=False)
 def img_to_base64(img_path):
     try:
         if not os.path.exists(img_path):
             st.warning(f"Bild nicht gefunden: {img_path}. Platzhalter wird verwendet.")
             return "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
 
-        img = Image.open(img_path)
-
-        buffered = BytesIO()
-
-        # WICHTIG: kein PNG mehr erzwingen
-        img = img.convert("RGB")
-        img.save(buffered, format="WEBP", quality=70)
-
-        img_b64 = base64.b64encode(buffered.getvalue()).decode()
+        # WICHTIG: kein PNG mehr erzwingen (WebP in Thumbnail-Breite)
+        img_b64 = base64.b64encode(image_cache().get(img_path)).decode()
         return f"data:image/webp;base64,{img_b64}"
 
     except Exception as e:
         st.error(f"Fehler beim Laden oder Konvertieren des Bildes {img_path}: {e}")
         return "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
 
-def image_for_ui(original_path: str) -> str:
+@st.cache_resource(show_spinner="Bereite Kartenbilder vor …", max_entries=1)
+def _image_manifest(mtime: float) -> ImageManifest:
+    """
+    Prüft (einmal pro Prozess bzw. pro Katalogstand) das Bild-Manifest, baut fehlende
+    Varianten unter static/img/ (parallel) und liefert das Manifest. Im Docker-Image ist
+    beides schon vorgebaut.
     """
-    Liefert optimiertes Bild (webp), falls vorhanden,
-    sonst das Original.
+    return build_manifest(load_catalog()["img"].dropna())
+
+def price_trend_html(price, price_prev, price_changed) -> str:
+    """Pfeil hinter dem Preis: Richtung der letzten Preisänderung (Tooltip: vorheriger Preis + Datum)."""
+    if pd.isna(price) or pd.isna(price_prev) or price == price_prev:
+        return ""
+    up = price > price_prev
+    changed_str = price_changed.strftime('%d.%m.%Y') if pd.notna(price_changed) else '-'
+    title = f"vorher {price_prev:.1f}€, geändert am {changed_str}"
+    return f' <span class="{"trend-up" if up else "trend-down"}" title="{title}">{"▲" if up else "▼"}</span>'
+
+def card_image_html(original_path: str, manifest: ImageManifest) -> str:
     """
-    p = Path(original_path)
-    webp = p.with_suffix(".webp")
-    return str(webp if webp.exists() else p)
+    <img>-Markup für eine Karte: srcset über die statischen Varianten (der Browser wählt
+    je nach Pixeldichte), lazy geladen, per Klick die zoom-Variante in einem neuen Tab.
+    Fallback: das Bild inline als Data-URL.
+    """
+    variants = manifest.urls(original_path)
+    srcset = ", ".join(
+        f"{variants[v]} {IMAGE_WIDTHS[v]}w" for v in SRCSET_VARIANTS if v in variants
+    )
+    if not srcset:
+        metrics.count("images", source="fallback")
+        with metrics.span("img_to_base64"):
+            return f'<img src="{img_to_base64(str(source_for(original_path)))}" />'
+    metrics.count("images", source="manifest")
+
+    src = variants.get(SRCSET_VARIANTS[0]) or next(iter(variants.values()))
+    img_html = (
+        f'<img src="{src}" srcset="{srcset}" sizes="{IMAGE_WIDTHS["thumb"]}px" '
+        f'loading="lazy" decoding="async" alt="" />'
+    )
+    zoom = variants.get("zoom")
+    if not zoom:
+        return img_html
+    return f'<a class="card-zoom" href="{zoom}" target="_blank" rel="noopener" title="Vergrößern">{img_html}</a>'
+
+def catalog_mtime() -> float:
+    """Stand des Katalogs (CSV bzw. daraus gebaute Arrow-Datei) – Teil aller Katalog-Cache-Keys."""
+    return max(os.path.getmtime(p) for p in (CATALOG_CSV, CATALOG_ARROW) if os.path.exists(p))
+
+catalog_log = logging.getLogger("pika.catalog")
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_catalog_cached(mtime: float) -> pd.DataFrame:
+    # mtime ist Teil des Cache-Keys -> neue CSV/Arrow-Datei wird automatisch neu eingelesen
+    # Einzelmeldungen je Zeile nur als debug, im Server-Log eine Zusammenfassung pro Laden
+    stats = {}
+    df = read_catalog(report=catalog_log.debug, stats=stats)
+    if stats.get("arrow_error") or stats.get("skipped") or stats.get("duplicates"):
+        catalog_log.warning(
+            "Katalog aus %s geladen: %d Zeilen übersprungen, %d doppelte karte_ids%s (Details: python catalog.py)",
+            CATALOG_CSV, stats.get("skipped", 0), stats.get("duplicates", 0),
+            f"; Arrow-Datei nicht nutzbar: {stats['arrow_error']}" if stats.get("arrow_error") else "",
+        )
+    return df
+
+def load_catalog() -> pd.DataFrame:
+    """
+    Katalog einmal pro Prozess laden (geteilt über alle Sessions), bevorzugt aus der
+    gebauten Arrow-Datei (memory-map), sonst aus der CSV.
+    Der Frame ist read-only: Filter erzeugen neue Frames, nie in-place ändern.
+    """
+    return _load_catalog_cached(catalog_mtime())
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _filter_index_cached(mtime: float) -> FilterIndex:
+    return FilterIndex(_load_catalog_cached(mtime))
+
+def load_filter_index() -> FilterIndex:
+    """Filter-Index zum aktuellen Katalog (einmal pro Prozess und Katalogstand gebaut)."""
+    return _filter_index_cached(catalog_mtime())
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _karte_id_labels_cached(mtime: float) -> dict:
+    # karte_id -> Index-Label der ersten Katalogzeile mit dieser karte_id
+    ids = _load_catalog_cached(mtime)["karte_id"]
+    return dict(zip(ids[::-1], ids.index[::-1]))
+
+def catalog_rows_for(karte_ids) -> pd.DataFrame:
+    """Katalogzeilen zu karte_ids in deren Reihenfolge (unbekannte karte_ids fehlen)."""
+    labels = _karte_id_labels_cached(catalog_mtime())
+    return load_catalog().loc[[labels[k] for k in karte_ids if k in labels]]
+
+# --- Besitz laden: seitenweise + Snapshot pro User + Delta-Sync (supabase/user_cards_sync.sql) ---
+# Erster Load pro User und Prozess: alle user_cards seitenweise (Range-Header). Danach
+# liegt ein Snapshot mit Hochwassermarke (Server-Zeit) im Prozess; neue Sessions
+# (Reload, zweiter Tab) und der periodische Sync holen nur noch die Änderungen seitdem:
+# geänderte Zeilen (updated_at) und Grabsteine gelöschter Karten (user_cards_deleted).
+BESITZ_PAGE_SIZE = 1000
+BESITZ_REMOTE_SYNC_SEC = 30
+# Deltas überlappen sich um so viel (Uhrzeit-Auflösung, noch nicht committete Transaktionen)
+BESITZ_SYNC_OVERLAP_SEC = 10
+# Snapshots mit älterer Hochwassermarke werden komplett neu geladen
+# (Grabsteine werden serverseitig irgendwann aufgeräumt)
+BESITZ_SNAPSHOT_MAX_AGE_SEC = 24 * 3600
+BESITZ_SNAPSHOT_MAX_USERS = 256
+
+class BesitzSnapshots:
+    """Prozessweite Besitz-Snapshots je User (LRU, thread-safe)."""
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self.delta_supported = True
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> dict | None:
+        with self._lock:
+            snap = self._entries.get(user_id)
+            if snap is None:
+                return None
+            if datetime.now(timezone.utc) - snap["hwm"] > timedelta(seconds=BESITZ_SNAPSHOT_MAX_AGE_SEC):
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return {"ids": set(snap["ids"]), "hwm": snap["hwm"]}
+
+    def put(self, user_id: str, ids, hwm: datetime) -> None:
+        with self._lock:
+            self._entries[user_id] = {"ids": frozenset(ids), "hwm": hwm}
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+@st.cache_resource
+def besitz_snapshots() -> BesitzSnapshots:
+    return BesitzSnapshots(BESITZ_SNAPSHOT_MAX_USERS)
 
-def load_besitz_from_supabase(user_id: str):
-    """Lädt die besessenen Karten-IDs des eingeloggten Users aus der Tabelle user_cards."""
+def _server_time(r: requests.Response) -> datetime:
+    """Server-Zeit aus dem Date-Header (Fallback: lokale Uhr)."""
     try:
-        url = f"{SUPABASE_URL}/rest/v1/user_cards"
-        params = {"select": "karte_id", "user": f"eq.{user_id}"}
-        r = _sb_request("GET", url, params=params)
+        return parsedate_to_datetime(r.headers["Date"])
+    except (KeyError, TypeError, ValueError):
+        return datetime.now(timezone.utc)
+
+def _fetch_pages(url: str, params: dict) -> tuple[list[dict], datetime]:
+    """
+    Holt alle Zeilen einer PostgREST-Abfrage seitenweise (Range-Header, BESITZ_PAGE_SIZE).
+    Eine kurze Seite heißt nicht "fertig": mit max-rows < BESITZ_PAGE_SIZE kürzt der Server
+    jede Seite. Weiter geht es deshalb ab der tatsächlich gelieferten Zeilenzahl, bis die
+    Gesamtzahl (Prefer: count=exact, Content-Range) erreicht ist bzw. eine leere Seite/416 kommt.
+    Returns (Zeilen, Server-Zeit der ersten Antwort).
+    """
+    rows, server_time, total = [], None, None
+    offset = 0
+    while total is None or offset < total:
+        headers = _sb_headers_user() | {
+            "Range-Unit": "items",
+            "Range": f"{offset}-{offset + BESITZ_PAGE_SIZE - 1}",
+        }
+        if total is None:
+            headers["Prefer"] = "count=exact"
+        r = _sb_request("GET", url, headers=headers, params=params)
+        if r.status_code == 416:
+            break
         r.raise_for_status()
-        rows = r.json() or []
-        return [row["karte_id"] for row in rows if "karte_id" in row]
+        if server_time is None:
+            server_time = _server_time(r)
+        page = r.json() or []
+        if not page:
+            break
+        rows.extend(page)
+        offset += len(page)
+        if total is None:
+            total = _content_range_total(r, default=None)
+    return rows, server_time or datetime.now(timezone.utc)
+
+def _delta_unsupported(e: requests.HTTPError) -> bool:
+    # 400/404: Spalte updated_at bzw. Tabelle user_cards_deleted fehlt (Migration nicht ausgeführt)
+    return e.response is not None and e.response.status_code in (400, 404)
+
+def _load_besitz_full(user_id: str) -> tuple[set[str], datetime]:
+    url = f"{SUPABASE_URL}/rest/v1/user_cards"
+    params = {"select": "karte_id", "user": f"eq.{user_id}", "order": "karte_id.asc"}
+    rows, server_time = _fetch_pages(url, params)
+    return {row["karte_id"] for row in rows if "karte_id" in row}, server_time
+
+def _load_besitz_delta(user_id: str, since: datetime) -> tuple[set[str], set[str], datetime]:
+    """Returns (hinzugekommene, gelöschte karte_ids seit since, neue Hochwassermarke)."""
+    since_iso = (since - timedelta(seconds=BESITZ_SYNC_OVERLAP_SEC)).isoformat()
+    added_rows, server_time = _fetch_pages(
+        f"{SUPABASE_URL}/rest/v1/user_cards",
+        {"select": "karte_id", "user": f"eq.{user_id}", "updated_at": f"gte.{since_iso}", "order": "karte_id.asc"},
+    )
+    deleted_rows, _ = _fetch_pages(
+        f"{SUPABASE_URL}/rest/v1/user_cards_deleted",
+        {"select": "karte_id", "user": f"eq.{user_id}", "deleted_at": f"gte.{since_iso}", "order": "karte_id.asc"},
+    )
+    added = {row["karte_id"] for row in added_rows}
+    # Grabsteine und Zeilen schließen sich serverseitig aus; im Zweifel gewinnt die Zeile
+    deleted = {row["karte_id"] for row in deleted_rows} - added
+    return added, deleted, server_time
+
+def load_besitz_from_supabase(user_id: str) -> set[str]:
+    """
+    Lädt die besessenen Karten-IDs des eingeloggten Users (Tabelle user_cards):
+    aus dem Prozess-Snapshot + Delta, sonst komplett (seitenweise).
+    Merkt sich die Hochwassermarke der Session in st.session_state["besitz_hwm"].
+    """
+    snapshots = besitz_snapshots()
+    try:
+        snap = snapshots.get(user_id) if snapshots.delta_supported else None
+        if snap is not None:
+            try:
+                added, deleted, hwm = _load_besitz_delta(user_id, snap["hwm"])
+                ids = (snap["ids"] | added) - deleted
+                snapshots.put(user_id, ids, hwm)
+                st.session_state["besitz_hwm"] = hwm
+                st.session_state["besitz_synced_at"] = time.time()
+                return ids
+            except Exception as e:
+                if isinstance(e, requests.HTTPError) and _delta_unsupported(e):
+                    snapshots.delta_supported = False
+                # sonst (z.B. Timeout): unten komplett laden
+
+        ids, hwm = _load_besitz_full(user_id)
+        snapshots.put(user_id, ids, hwm)
+        st.session_state["besitz_hwm"] = hwm
+        st.session_state["besitz_synced_at"] = time.time()
+        return ids
     except Exception as e:
         st.warning(f"Fehler beim Laden aus Supabase: {e}")
-        return []
+        return set()
 
+def sync_besitz_from_supabase(user_id: str) -> bool:
+    """
+    Holt Änderungen anderer Geräte/Tabs seit der Hochwassermarke der Session und
+    übernimmt sie in st.session_state["besitz"] (lokal offene Änderungen haben Vorrang).
+    Returns True, wenn sich der Besitz dadurch geändert hat.
+    """
+    snapshots = besitz_snapshots()
+    since = st.session_state.get("besitz_hwm")
+    if since is None or not snapshots.delta_supported:
+        return False
+    try:
+        added, deleted, hwm = _load_besitz_delta(user_id, since)
+    except Exception as e:
+        if isinstance(e, requests.HTTPError) and _delta_unsupported(e):
+            snapshots.delta_supported = False
+        return False  # sonst: nächster Versuch beim nächsten Intervall
+
+    st.session_state["besitz_hwm"] = hwm
+    besitz = st.session_state["besitz"]
+    pending = st.session_state.get("besitz_pending") or {}
+    new_ids = (besitz | added) - deleted
+    for karte_id, add in pending.items():
+        if add:
+            new_ids.add(karte_id)
+        else:
+            new_ids.discard(karte_id)
 
-def save_besitz_change_to_supabase(user: str, karte_id: str, add: bool) -> None:
+    if not pending:
+        snapshots.put(user_id, new_ids, hwm)
+    if new_ids == besitz:
+        return False
+    besitz.clear()
+    besitz.update(new_ids)
+    besitz_changed()
+    return True
+
+# --- Besitz-Store ---
+# st.session_state["besitz"] ist ein set der karte_ids; "besitz_version" wird bei jeder
+# Änderung hochgezählt, damit davon abgeleitete Daten (Masken, Statistiken) wissen,
+# wann sie neu berechnet werden müssen. "besitz_edit_version" zählt nur Klicks des Users,
+# "besitz_server_version" nur erfolgreiche Schreibzugriffe (Server-Kennzahlen neu holen).
+def set_besitz(karte_ids) -> None:
+    st.session_state["besitz"] = set(karte_ids)
+    besitz_changed()
+
+def besitz_changed() -> None:
+    """Nach jeder Änderung an st.session_state["besitz"] aufrufen."""
+    st.session_state["besitz_version"] = st.session_state.get("besitz_version", 0) + 1
+
+def besitz_saved() -> None:
+    """Nach jedem erfolgreichen Schreiben nach Supabase aufrufen."""
+    st.session_state["besitz_server_version"] = st.session_state.get("besitz_server_version", 0) + 1
+
+def owned_mask(catalog_df: pd.DataFrame) -> pd.Series:
     """
-    add=True  -> INSERT/UPSERT einer (user, karte_id) Zeile
-    add=False -> DELETE dieser Zeile
+    Bool-Series "besessen" passend zum Katalog-Index. Wird nur neu berechnet, wenn sich
+    der Besitz (besitz_version) oder der Katalog geändert hat. Gefilterte Frames behalten
+    den Katalog-Index -> owned_mask(catalog)[df.index] bzw. .reindex(df.index).
+    """
+    version = st.session_state.get("besitz_version", 0)
+    cached = st.session_state.get("owned_mask")
+    if cached is None or cached[0] != version or cached[1] is not catalog_df:
+        mask = catalog_df["karte_id"].isin(st.session_state.get("besitz", set()))
+        cached = (version, catalog_df, mask)
+        st.session_state["owned_mask"] = cached
+    return cached[2]
+
+
+# PostgREST: URL-Länge begrenzen -> DELETE ... karte_id=in.(...) in Häppchen
+BESITZ_DELETE_CHUNK = 100
+
+def _postgrest_in(values) -> str:
+    """Baut einen in.(...)-Filter; Werte werden gequotet (karte_ids enthalten Leerzeichen etc.)."""
+    quoted = ('"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values)
+    return f"in.({','.join(quoted)})"
+
+def save_besitz_changes_to_supabase(user: str, add_ids, remove_ids, count: bool = False) -> int | None:
+    """
+    Schreibt mehrere Besitz-Änderungen gebündelt:
+    - add_ids    -> ein Bulk-UPSERT aller (user, karte_id) Zeilen
+    - remove_ids -> DELETE ... karte_id=in.(...) (in Häppchen à BESITZ_DELETE_CHUNK)
+    Beides ist idempotent -> nach Fehlern einfach komplett wiederholbar.
+    count=True: der Server zählt die tatsächlich geänderten Zeilen mit (Prefer: count=exact,
+    vorhandene Karten werden dann ignoriert statt überschrieben). Returns diese Anzahl bzw. None.
     """
     base = f"{SUPABASE_URL}/rest/v1/user_cards"
+    add_ids = list(add_ids)
+    remove_ids = list(remove_ids)
+    changed = 0
 
-    if add:
-        payload = [{"user": user, "karte_id": karte_id}]
+    if add_ids:
+        payload = [{"user": user, "karte_id": k} for k in add_ids]
         # on_conflict sorgt dafür, dass du keine Duplikate bekommst (PK user+karte_id)
-        headers = _sb_headers_user() | {"Prefer": "resolution=merge-duplicates"}
+        prefer = "resolution=ignore-duplicates,count=exact" if count else "resolution=merge-duplicates"
+        headers = _sb_headers_user() | {"Prefer": prefer}
         r = _sb_request("POST", base, headers=headers, params={"on_conflict": "user,karte_id"}, json=payload)
         r.raise_for_status()
-    else:
-        r = _sb_request("DELETE", base, params={"user": f"eq.{user}", "karte_id": f"eq.{karte_id}"})
+        changed += _content_range_total(r)
+
+    prefer = {"Prefer": "count=exact"} if count else {}
+    for i in range(0, len(remove_ids), BESITZ_DELETE_CHUNK):
+        chunk = remove_ids[i : i + BESITZ_DELETE_CHUNK]
+        r = _sb_request(
+            "DELETE", base, headers=_sb_headers_user() | prefer,
+            params={"user": f"eq.{user}", "karte_id": _postgrest_in(chunk)},
+        )
         r.raise_for_status()
+        changed += _content_range_total(r)
+    return changed if count else None
+
+# --- Optional: Besitz-Filter + Kennzahlen serverseitig (supabase/catalog_cards.sql) ---
+# Statt aller karte_ids des Users kommen nur die Kennzahlen (RPC catalog_stats) und die
+# gerade angezeigte Seite (karte_id + owned aus dem View catalog_cards_owned) über die Leitung.
+SERVER_FILTERING = os.environ.get("SERVER_FILTERING", "0") == "1"
+
+def _server_filter_params(server_filter: dict) -> list[tuple[str, str]]:
+    """Sidebar-Filter -> PostgREST-Query-Parameter (gleiche Semantik wie die lokalen Masken)."""
+    params = []
+    for col in ("generation", "set_name", "rarity"):
+        if server_filter.get(col):
+            params.append((col, _postgrest_in(server_filter[col])))
+    if server_filter.get("pokemon_name"):
+        params.append(("pokemon_name", f"eq.{server_filter['pokemon_name']}"))
+    for col, low, high in (("price", "price_min", "price_max"), ("pokemon_id", "id_min", "id_max")):
+        if server_filter.get(low) is not None:
+            params.append((col, f"gte.{server_filter[low]}"))
+        if server_filter.get(high) is not None:
+            params.append((col, f"lte.{server_filter[high]}"))
+    if server_filter.get("owned") is not None:
+        params.append(("owned", "is.true" if server_filter["owned"] else "is.false"))
+    return params
+
+def _content_range_total(r: requests.Response, default: int | None = 0) -> int | None:
+    # Content-Range: "0-47/1205" bzw. "*/0"; ohne Gesamtzahl ("0-47/*") -> default
+    total = r.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+    return int(total) if total.isdigit() else default
+
+def fetch_catalog_page_from_supabase(server_filter: dict, offset: int, limit: int) -> tuple[list[dict], int]:
+    """
+    Eine Seite (karte_id, owned) aus catalog_cards_owned, sortiert wie das lokale Raster.
+    Range-Header statt limit/offset, Prefer: count=exact liefert die Gesamtzahl mit.
+    Returns (Zeilen, Gesamtzahl).
+    """
+    url = f"{SUPABASE_URL}/rest/v1/catalog_cards_owned"
+    params = [
+        ("select", "karte_id,owned"),
+        ("order", "pokemon_name.asc,card_number.asc,karte_id.asc"),
+    ] + _server_filter_params(server_filter)
+    headers = _sb_headers_user() | {
+        "Prefer": "count=exact",
+        "Range-Unit": "items",
+        "Range": f"{offset}-{offset + limit - 1}",
+    }
+    r = _sb_request("GET", url, headers=headers, params=params)
+    if r.status_code == 416:
+        # Seite hinter dem Ende (z.B. nach Entfernen der letzten Karten)
+        return [], _content_range_total(r)
+    r.raise_for_status()
+    return r.json() or [], _content_range_total(r)
+
+def fetch_catalog_stats_from_supabase(server_filter: dict) -> dict:
+    """
+    Zusammenfassung + Sammelfortschritt für die Filter (RPC catalog_stats, ein Request).
+    Zählt nur gespeicherten Besitz, offene Änderungen rechnet add_pending_to_stats dazu.
+    """
+    url = f"{SUPABASE_URL}/rest/v1/rpc/catalog_stats"
+    r = _sb_request("POST", url, json={f"p_{k}": v for k, v in server_filter.items()})
+    r.raise_for_status()
+    stats = r.json()
+    latest = stats.get("latest_update")
+    stats["latest_update"] = pd.Timestamp(latest) if latest else None
+    return stats
+
+def add_pending_to_stats(stats: dict, df: pd.DataFrame, owned: bool | None) -> dict:
+    """
+    Rechnet die noch nicht gespeicherten Änderungen der Queue auf die Server-Kennzahlen,
+    statt für jeden Klick zu flushen und catalog_stats neu zu holen.
+    df: nach den Katalog-Filtern (ohne Besitz) gefiltert, owned: der Besitzfilter.
+    Karten-Zahlen und Gesamtwert stimmen sofort, Pokémon-Zahlen und Range erst nach dem Flush.
+    """
+    pending = st.session_state.get("besitz_pending") or {}
+    if not pending:
+        return stats
+    rows = df[df["karte_id"].isin(list(pending))]
+    if rows.empty:
+        return stats
+    added = rows["karte_id"].map(pending).astype(bool)
+    delta = int(added.sum()) - int((~added).sum())
+    wert = float(rows.loc[added, "price"].sum() - rows.loc[~added, "price"].sum())
+
+    stats = dict(stats)
+    if owned is None:
+        stats["karten_besitz"] += delta
+    elif owned:
+        stats["anzahl_karten"] += delta
+        stats["karten_besitz"] += delta
+        stats["gesamtwert"] += wert
+    else:
+        stats["anzahl_karten"] -= delta
+        stats["gesamtwert"] -= wert
+    return stats
+
+def server_catalog_stats(server_filter: dict, filter_key: str, df: pd.DataFrame) -> dict:
+    """
+    catalog_stats für die aktuellen Filter inkl. offener Änderungen. Der Request läuft nur,
+    wenn sich Filter oder gespeicherter Besitz (besitz_server_version) geändert haben;
+    Fortschritt, Zusammenfassung und Bulk-Editor teilen sich das Ergebnis.
+    """
+    stats = memoize_in_session(
+        "server_stats_memo",
+        (filter_key, repr(server_filter), st.session_state.get("besitz_server_version", 0)),
+        lambda: fetch_catalog_stats_from_supabase(server_filter),
+    )
+    return add_pending_to_stats(stats, df, server_filter.get("owned"))
+
+def merge_server_besitz(rows: list[dict]) -> None:
+    """
+    Besitz der angezeigten Seite vom Server in st.session_state["besitz"] übernehmen
+    (im Servermodus kennt die Session nur die Karten, die sie schon angezeigt hat).
+    Lokal noch nicht gespeicherte Änderungen haben Vorrang.
+    """
+    besitz = st.session_state["besitz"]
+    pending = st.session_state.get("besitz_pending") or {}
+    changed = False
+    for row in rows:
+        karte_id = row["karte_id"]
+        if karte_id in pending or (karte_id in besitz) == bool(row["owned"]):
+            continue
+        if row["owned"]:
+            besitz.add(karte_id)
+        else:
+            besitz.discard(karte_id)
+        changed = True
+    if changed:
+        besitz_changed()
+
+# --- Write-Behind-Queue für Besitz-Änderungen ---
+# Klicks ändern st.session_state["besitz"] sofort (optimistisch) und landen in
+# st.session_state["besitz_pending"] (karte_id -> True=hinzufügen / False=entfernen).
+# flush_besitz_changes() schreibt gesammelt, sobald genug zusammen ist oder die
+# älteste Änderung alt genug ist.
+BESITZ_FLUSH_BATCH = 25
+BESITZ_FLUSH_MAX_AGE_SEC = 3
+BESITZ_SYNC_INTERVAL_SEC = 5
+BESITZ_RETRY_MAX_SEC = 60
+
+def queue_besitz_change(karte_id: str, add: bool) -> None:
+    pending = st.session_state.setdefault("besitz_pending", {})
+    if not pending:
+        st.session_state["besitz_pending_since"] = time.time()
+    if pending.get(karte_id, add) != add:
+        # Hinzufügen + Entfernen (oder umgekehrt) vor dem Sync heben sich auf
+        del pending[karte_id]
+    else:
+        pending[karte_id] = add
+
+def toggle_besitz(karte_id: str) -> None:
+    """on_click-Callback der Karten-Buttons: lokal sofort umschalten, Sync später."""
+    besitz = st.session_state["besitz"]
+    add = karte_id not in besitz
+    if add:
+        besitz.add(karte_id)
+    else:
+        besitz.discard(karte_id)
+    besitz_changed()
+    st.session_state["besitz_edit_version"] = st.session_state.get("besitz_edit_version", 0) + 1
+    queue_besitz_change(karte_id, add)
+
+def flush_besitz_changes(user_id: str, force: bool = False) -> bool:
+    """
+    Schreibt offene Besitz-Änderungen nach Supabase.
+    Returns True, wenn danach nichts mehr offen ist.
+    Bei Fehlern bleiben die Änderungen in der Queue (Retry mit exponentiellem Backoff).
+    """
+    pending = st.session_state.get("besitz_pending") or {}
+    if not pending:
+        return True
+
+    now = time.time()
+    if not force:
+        too_young = now - st.session_state.get("besitz_pending_since", now) < BESITZ_FLUSH_MAX_AGE_SEC
+        if len(pending) < BESITZ_FLUSH_BATCH and too_young:
+            return False
+        if now < st.session_state.get("besitz_retry_at", 0):
+            return False
+
+    snapshot = dict(pending)
+    try:
+        save_besitz_changes_to_supabase(
+            user_id,
+            add_ids=[k for k, add in snapshot.items() if add],
+            remove_ids=[k for k, add in snapshot.items() if not add],
+        )
+    except Exception as e:
+        failures = st.session_state.get("besitz_sync_failures", 0) + 1
+        st.session_state["besitz_sync_failures"] = failures
+        st.session_state["besitz_retry_at"] = now + min(BESITZ_RETRY_MAX_SEC, 2 ** failures)
+        st.session_state["besitz_sync_error"] = str(e)
+        return False
+
+    # Nur entfernen, was inzwischen nicht erneut geändert wurde
+    for k, add in snapshot.items():
+        if pending.get(k) == add:
+            del pending[k]
+    besitz_saved()
+    st.session_state["besitz_pending_since"] = now
+    st.session_state["besitz_sync_failures"] = 0
+    st.session_state["besitz_retry_at"] = 0
+    st.session_state["besitz_sync_error"] = None
+    return not pending
+
+# Bulk-Upsert: so viele Zeilen pro Request (Fortschritt wird pro Häppchen gemeldet)
+BESITZ_BULK_CHUNK = 500
+
+def apply_besitz_bulk(user_id: str, karte_ids, add: bool, on_progress=None) -> int:
+    """
+    Fügt alle karte_ids der Kollektion hinzu (add=True) bzw. entfernt sie.
+    Schreibt direkt (an der Queue vorbei): ein Bulk-UPSERT bzw. DELETE ... in.(...)
+    je Häppchen, on_progress(fertig, gesamt) nach jedem Häppchen.
+    Jedes gespeicherte Häppchen wird sofort auch lokal übernommen: schlägt Häppchen n
+    fehl (Exception), zeigt die App trotzdem den Stand des Servers (1 bis n-1 gespeichert).
+    Returns Anzahl der Karten, die der Server tatsächlich geändert hat (im Servermodus
+    kennt der lokale Besitz nur die schon angezeigten Karten).
+    """
+    karte_ids = list(dict.fromkeys(karte_ids))
+    chunk_size = BESITZ_BULK_CHUNK if add else BESITZ_DELETE_CHUNK
+    pending = st.session_state.get("besitz_pending") or {}
+    besitz = st.session_state["besitz"]
+    changed = 0
+    local_changed = 0
+    try:
+        for i in range(0, len(karte_ids), chunk_size):
+            chunk = karte_ids[i : i + chunk_size]
+            # Alle Karten im Scope schreiben, nicht nur die lokal geänderten: lokal ist
+            # optimistisch (Queue), UPSERT/DELETE sind idempotent.
+            if add:
+                changed += save_besitz_changes_to_supabase(user_id, add_ids=chunk, remove_ids=[], count=True)
+            else:
+                changed += save_besitz_changes_to_supabase(user_id, add_ids=[], remove_ids=chunk, count=True)
+            besitz_saved()
+
+            # Server hat für dieses Häppchen den Endzustand -> offene Einzel-Änderungen sind erledigt
+            for k in chunk:
+                pending.pop(k, None)
+            if add:
+                chunk_changed = set(chunk) - besitz
+                besitz |= chunk_changed
+            else:
+                chunk_changed = besitz.intersection(chunk)
+                besitz -= chunk_changed
+            local_changed += len(chunk_changed)
+            if on_progress:
+                on_progress(min(i + chunk_size, len(karte_ids)), len(karte_ids))
+    finally:
+        if local_changed:
+            besitz_changed()
+    return changed
+
+@st.fragment
+def render_besitz_bulk(
+    user_id: str,
+    filtered_df: pd.DataFrame,
+    set_names,
+    server_filter: dict | None = None,
+    filter_key: str | None = None,
+) -> None:
+    """
+    Ganze Filteransicht oder ein ganzes Set auf einmal als Besitz markieren/entfernen.
+    Fragment: Auswahl ändern rerunt nur diesen Block, erst das Speichern die ganze App.
+    Im Servermodus (server_filter gesetzt) fehlt in filtered_df der Besitzfilter: die Größe
+    der Ansicht kommt dann vom Server, und angeboten wird nur die Aktion, die die Ansicht
+    ändert (auf der Obermenge geschrieben ergibt sie dasselbe wie auf der Ansicht).
+    """
+    with st.expander("📦 Mehrere Karten bearbeiten"):
+        scope = st.radio(
+            "Auswahl",
+            ["Aktuelle Filteransicht", "Ganzes Set"],
+            key="bulk_scope",
+            horizontal=True,
+        )
+        owned = None
+        if scope == "Ganzes Set":
+            set_name = st.selectbox("Set", set_names, key="bulk_set_name")
+            karte_ids = catalog.loc[catalog["set_name"] == set_name, "karte_id"].tolist()
+            count = len(karte_ids)
+        else:
+            karte_ids = filtered_df["karte_id"].tolist()
+            count = len(karte_ids)
+            if server_filter is not None and server_filter.get("owned") is not None:
+                owned = server_filter["owned"]
+                try:
+                    count = server_catalog_stats(server_filter, filter_key, filtered_df)["anzahl_karten"]
+                except Exception as e:
+                    st.error(f"Fehler beim Laden vom Server: {e}")
+                    return
+        st.caption(f"{count} Karten ausgewählt")
+
+        col_add, col_remove = st.columns(2)
+        # "Nur Besitz" + hinzufügen bzw. "Nur Nicht-Besitz" + entfernen ändern nichts
+        add = col_add.button("➕ Alle hinzufügen", key="btn_bulk_add", disabled=not count or owned is True)
+        # Entfernen erst nach Bestätigung – und nur, solange die Auswahl dieselbe ist
+        col_remove.button(
+            "❌ Alle entfernen", key="btn_bulk_remove", disabled=not count or owned is False,
+            on_click=st.session_state.__setitem__, args=("bulk_remove_confirm", karte_ids),
+        )
+        remove = False
+        if st.session_state.get("bulk_remove_confirm") not in (None, karte_ids):
+            del st.session_state["bulk_remove_confirm"]
+        if "bulk_remove_confirm" in st.session_state:
+            st.warning(f"Wirklich {count} Karten aus der Kollektion entfernen?")
+            col_yes, col_no = st.columns(2)
+            remove = col_yes.button("Ja, entfernen", key="btn_bulk_remove_yes", type="primary")
+            col_no.button(
+                "Abbrechen", key="btn_bulk_remove_no",
+                on_click=st.session_state.pop, args=("bulk_remove_confirm", None),
+            )
+            if remove:
+                del st.session_state["bulk_remove_confirm"]
+        if not (add or remove):
+            return
+
+        bar = st.progress(0.0, text="Speichere …")
+        saved = {"done": 0}
+
+        def on_progress(done, total):
+            saved["done"] = done
+            bar.progress(done / total, text=f"{done} von {total} Karten gespeichert")
+
+        try:
+            changed = apply_besitz_bulk(user_id, karte_ids, add=add, on_progress=on_progress)
+        except Exception as e:
+            if not saved["done"]:
+                st.error(f"Speichern fehlgeschlagen: {e}")
+                return
+            # Teilweise gespeichert: lokal schon übernommen -> ganze App zeigt den neuen Stand
+            st.session_state["bulk_error"] = (
+                f"Speichern nach {saved['done']} von {len(karte_ids)} Karten fehlgeschlagen: {e}"
+            )
+            st.rerun()
+        st.session_state["bulk_result"] = f"✅ {changed} Karten {'hinzugefügt' if add else 'entfernt'}"
+        st.rerun()
+
+@st.fragment(run_every=BESITZ_SYNC_INTERVAL_SEC)
+def render_besitz_sync_status(user_id: str) -> None:
+    """
+    Läuft periodisch für sich allein: synchronisiert die Queue, holt alle
+    BESITZ_REMOTE_SYNC_SEC Änderungen anderer Geräte/Tabs und zeigt den Status.
+    """
+    flush_besitz_changes(user_id)
+
+    # Im Servermodus kommt der Besitz ohnehin frisch mit jeder Seite
+    now = time.time()
+    if not SERVER_FILTERING and now - st.session_state.get("besitz_synced_at", now) >= BESITZ_REMOTE_SYNC_SEC:
+        st.session_state["besitz_synced_at"] = now
+        if sync_besitz_from_supabase(user_id):
+            st.rerun()
+
+    pending = st.session_state.get("besitz_pending") or {}
+    if not pending:
+        return
+
+    st.caption(f"⏳ {len(pending)} ungespeicherte Änderung(en)")
+    error = st.session_state.get("besitz_sync_error")
+    if error:
+        st.warning(f"Speichern fehlgeschlagen, neuer Versuch folgt automatisch: {error}")
+    st.button(
+        "Jetzt speichern", key="btn_flush_besitz",
+        on_click=flush_besitz_changes, args=(user_id,), kwargs={"force": True},
+    )
+
+@st.fragment
+@metrics.fragment("card_grid")
+def render_card_grid(
+    df: pd.DataFrame,
+    filter_key: str,
+    server_filter: dict | None = None,
+    besitz_filter_version: int | None = None,
+) -> None:
+    """
+    Sammelfortschritt + Kartenraster als eigenes Fragment: Karten-Toggles und
+    Seitenwechsel führen nur dieses Fragment neu aus, nicht die ganze App
+    (Auth, Plan, Filter, Zusammenfassung bleiben unangetastet).
+    Besitz wird hier jedes Mal frisch aus dem Session-State gelesen.
+    Im Servermodus (server_filter gesetzt) kommen Fortschritt und die angezeigte Seite
+    vom Server; df ist dann nur nach den Katalog-Filtern (ohne Besitz) gefiltert.
+    besitz_filter_version: bei aktivem Besitzfilter die besitz_edit_version, mit der df
+    gefiltert wurde. Hat ein Toggle den Besitz seitdem geändert, passen df, Filter und
+    Zusammenfassung nicht mehr -> ganze App neu statt nur das Fragment.
+    """
+    if besitz_filter_version is not None and besitz_filter_version != st.session_state.get("besitz_edit_version", 0):
+        st.rerun(scope="app")
+
+    catalog_owned = owned_mask(catalog)
+
+    if server_filter is not None:
+        try:
+            stats = server_catalog_stats(server_filter, filter_key, df)
+        except Exception as e:
+            st.error(f"Fehler beim Laden vom Server: {e}")
+            return
+        progress = {
+            "karten": stats["anzahl_karten"],
+            "karten_besitz": stats["karten_besitz"],
+            "pokemon": stats["anzahl_pokemon"],
+            "pokemon_besitz": stats["pokemon_besitz"],
+        }
+    else:
+        # Sammelfortschritt im gefilterten Frame (ändert sich mit jedem Karten-Toggle)
+        progress = memoize_in_session(
+            "progress_memo",
+            (filter_key, st.session_state.get("besitz_version", 0)),
+            lambda: collection_progress(df, catalog_owned[df.index]),
+        )
+    karten_fortschritt = progress["karten_besitz"] / progress["karten"] if progress["karten"] > 0 else 0
+    pokemon_fortschritt = progress["pokemon_besitz"] / progress["pokemon"] if progress["pokemon"] > 0 else 0
+
+    col_karten, col_pokemon = st.columns(2)
+    with col_karten:
+        st.markdown("**🃏 Karten gesammelt**")
+        st.progress(karten_fortschritt)
+        st.caption(f"{progress['karten_besitz']} von {progress['karten']} Karten ({karten_fortschritt*100:.0f}%)")
+    with col_pokemon:
+        st.markdown("**🔢 Pokémon abgedeckt**")
+        st.progress(pokemon_fortschritt)
+        st.caption(f"{progress['pokemon_besitz']} von {progress['pokemon']} Pokémon ({pokemon_fortschritt*100:.0f}%)")
+
+    # --- Pagination: nur die sichtbare Seite wird zu HTML/Widgets ---
+    if "page_size" not in st.session_state:
+        st.session_state["page_size"] = PAGE_SIZE_OPTIONS[1]
+
+    # Bei geänderten Filtern zurück auf Seite 1
+    filter_signature = tuple(repr(st.session_state.get(k)) for k in FILTER_STATE_KEYS)
+    if st.session_state.get("page_filter_signature") != filter_signature:
+        st.session_state["page_filter_signature"] = filter_signature
+        st.session_state["page"] = 1
+
+    page_size = st.session_state["page_size"]
+    total_cards = progress["karten"] if server_filter is not None else len(df)
+    page_count = max(1, math.ceil(total_cards / page_size))
+    st.session_state["page"] = min(max(int(st.session_state.get("page", 1)), 1), page_count)
+
+    col_size, col_page, col_info = st.columns([1, 1, 2])
+    with col_size:
+        st.selectbox("Karten pro Seite", PAGE_SIZE_OPTIONS, key="page_size")
+    with col_page:
+        st.number_input("Seite", min_value=1, max_value=page_count, step=1, key="page")
+    with col_info:
+        st.caption(f"Seite {st.session_state['page']} von {page_count} · {total_cards} Karten")
+
+    page = st.session_state["page"]
+    if server_filter is not None:
+        try:
+            rows, _ = fetch_catalog_page_from_supabase(server_filter, (page - 1) * page_size, page_size)
+        except Exception as e:
+            st.error(f"Fehler beim Laden vom Server: {e}")
+            return
+        merge_server_besitz(rows)
+        # Der Server kennt offene Änderungen noch nicht: Karten, die laut Queue nicht mehr
+        # zum Besitzfilter passen, nicht anzeigen
+        owned_filter = server_filter.get("owned")
+        if owned_filter is not None:
+            pending = st.session_state.get("besitz_pending") or {}
+            rows = [row for row in rows if pending.get(row["karte_id"], owned_filter) == owned_filter]
+        page_df = catalog_rows_for([row["karte_id"] for row in rows])
+    else:
+        page_df = df.sort_values(by=["pokemon_name", "card_number"]).iloc[(page - 1) * page_size : page * page_size]
+
+    # Gruppierung und Anzeige der Karten
+    cards_span = metrics.span("cards").begin()
+    manifest = _image_manifest(catalog_mtime())
+    for pokemon_name, gruppe in page_df.groupby("pokemon_name", observed=True, sort=False):
+        st.markdown(f"## {pokemon_name}")
+        for idx, row in gruppe.iterrows():
+            img_html = card_image_html(row["img"], manifest)
+            karte_id = row["karte_id"]
+            if server_filter is not None:
+                owned = karte_id in st.session_state["besitz"]
+            else:
+                owned = bool(catalog_owned.at[idx])
+            card_class = "card-box owned" if owned else "card-box"
+        
+            if 'G' in row['card_number']:
+                card_number_str = str(row['card_number']) if pd.notna(row['card_number']) else ''
+            else:
+                card_number_str = str(int(row['card_number'])) if pd.notna(row['card_number']) else ''
+        
+            set_size_str = str(row['set_size']) if pd.notna(row['set_size']) else ''
+            price_str = f"{row['price']:.1f}" if pd.notna(row['price']) else 'N/A'
+            rarity_str = row['rarity'] if pd.notna(row['rarity']) else 'Unknown'
+            update = row.get('update')
+            update_str = update.strftime('%d.%m.%Y') if pd.notna(update) else '-'
+            trend_html = price_trend_html(row['price'], row.get('price_prev'), row.get('price_changed'))
+
+            card_html = f"""
+            <div class="{card_class}">
+                {img_html}
+                <div class="card-text">
+                    <b>{row['pokemon_name']}</b><br>
+                    <i>{row['set_name']} #{card_number_str}/{set_size_str}</i><br>
+                    <b>{price_str}€</b>{trend_html}<span> (vom {update_str})</span><br>
+                    <span>{rarity_str}</span>
+                </div>
+            </div>
+            """
+            st.markdown(card_html, unsafe_allow_html=True)
+
+            if st.session_state.get("show_buttons", True):
+                button_id = f"btn_{karte_id}"
+                button_text = "❌ Aus Kollektion entfernen" if owned else "➕ Zur Kollektion hinzufügen"
+
+                # Callback läuft vor dem Rerun -> Karte wird direkt im neuen Zustand gerendert.
+                # Key mit Zeilen-Index: doppelte karte_ids im Katalog können auf derselben Seite landen
+                st.button(button_text, key=f"button_{karte_id}_{idx}", on_click=toggle_besitz, args=(karte_id,))
+    cards_span.end()
+    metrics.count("cards_rendered", len(page_df))
+
+    if page_count > 1:
+        col_prev, col_pos, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            st.button("◀ Vorherige Seite", key="btn_page_prev", disabled=page <= 1,
+                      on_click=_goto_page, args=(page - 1,))
+        with col_pos:
+            st.caption(f"Seite {page} von {page_count}")
+        with col_next:
+            st.button("Nächste Seite ▶", key="btn_page_next", disabled=page >= page_count,
+                      on_click=_goto_page, args=(page + 1,))
 
 def wait_for_pro_plan(user_id: str, timeout_sec: int = 10, interval_sec: float = 1.0) -> str:
     """
     Pollt die DB, bis plan == 'pro' oder Timeout erreicht ist.
+    Geht am Plan-Cache vorbei (jeder Poll aktualisiert ihn).
     """
     deadline = time.time() + timeout_sec
     last_plan = None
@@ -420,18 +1445,44 @@ def load_or_create_user_plan(user_id: str) -> str:
         data = r.json() or []
         if data:
             plan = (data[0].get("plan") or "basic").lower()
+            _cache_user_plan(user_id, plan)
             return plan
 
         # kein Profil vorhanden -> anlegen
         payload = [{"user_id": user_id, "plan": "basic"}]
         r2 = _sb_request("POST", url, json=payload)
         r2.raise_for_status()
+        _cache_user_plan(user_id, "basic")
         return "basic"
     except Exception as e:
-        # Fallback: App soll nicht kaputt gehen
+        # Fallback: App soll nicht kaputt gehen (wird bewusst nicht gecacht)
         st.warning(f"Konnte Plan nicht laden/initialisieren (fallback=basic): {e}")
         return "basic"
 
+# Plan ändert sich praktisch nur über Stripe -> nicht bei jedem Rerun neu laden
+PLAN_CACHE_TTL_SEC = 300
+
+def _cache_user_plan(user_id: str, plan: str) -> None:
+    st.session_state["plan_cache"] = {"user_id": user_id, "plan": plan, "loaded_at": time.time()}
+
+def invalidate_user_plan() -> None:
+    """Verwirft den gecachten Plan -> nächster get_user_plan() lädt aus der DB."""
+    st.session_state.pop("plan_cache", None)
+
+def get_user_plan(user_id: str) -> str:
+    """
+    Plan aus dem Session-Cache, solange jünger als PLAN_CACHE_TTL_SEC,
+    sonst über load_or_create_user_plan() (befüllt den Cache wieder).
+    """
+    cached = st.session_state.get("plan_cache")
+    if (
+        cached
+        and cached["user_id"] == user_id
+        and time.time() - cached["loaded_at"] < PLAN_CACHE_TTL_SEC
+    ):
+        return cached["plan"]
+    return load_or_create_user_plan(user_id)
+
 
 def render_plan_sidebar(plan: str) -> None:
     """Zeigt Plan-Status + Upgrade via Stripe Checkout (Edge Function)."""
@@ -459,6 +1510,61 @@ def render_plan_sidebar(plan: str) -> None:
             st.sidebar.error(f"Checkout konnte nicht gestartet werden: {e}")
 
 
+# Session-State Keys aller Sidebar-Filter (werden gespeichert/wiederhergestellt)
+FILTER_STATE_KEYS = (
+    "price_min", "price_max", "id_min", "id_max",
+    "Besitzfilter", "pokemon_name",
+    "multiselect_set", "multiselect_generation", "multiselect_rarity",
+)
+
+# Kartenraster: Karten pro Seite
+PAGE_SIZE_OPTIONS = [24, 48, 96]
+
+# Wie viele Filterzustände pro Session für die Zusammenfassung gemerkt werden
+SUMMARY_MEMO_SIZE = 16
+
+def filter_state_key(mask, catalog_mtime: float) -> str:
+    """Hash des Filterzustands (Ergebnis-Maske über den Katalog + Katalogstand)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(catalog_mtime).encode())
+    h.update(np.packbits(mask).tobytes())
+    return h.hexdigest()
+
+def memoize_in_session(name: str, key, compute):
+    """
+    Kleiner Memo-Cache in st.session_state[name]: compute() läuft nur für neue Keys,
+    die ältesten Einträge fliegen nach SUMMARY_MEMO_SIZE raus.
+    """
+    memo = st.session_state.setdefault(name, {})
+    if key not in memo:
+        if len(memo) >= SUMMARY_MEMO_SIZE:
+            memo.pop(next(iter(memo)))
+        memo[key] = compute()
+    return memo[key]
+
+def summary_stats(df: pd.DataFrame) -> dict:
+    """Kennzahlen der Zusammenfassung für den gefilterten Frame (ohne Besitz)."""
+    gruppen = df.groupby("pokemon_name", observed=True)["price"]
+    latest_update = df["update"].max() if "update" in df.columns else None
+    return {
+        "anzahl_karten": len(df),
+        "anzahl_pokemon": df["pokemon_name"].nunique(),
+        "gesamtwert": df["price"].sum(),
+        "min_pro_gruppe": gruppen.min().sum(),
+        "max_pro_gruppe": gruppen.max().sum(),
+        "latest_update": latest_update if pd.notna(latest_update) else None,
+    }
+
+def collection_progress(df: pd.DataFrame, df_owned: pd.Series) -> dict:
+    """Sammelfortschritt (Karten / Pokémon) im gefilterten Frame."""
+    return {
+        "karten": df["karte_id"].nunique(),
+        "karten_besitz": df.loc[df_owned, "karte_id"].nunique(),
+        "pokemon": df["pokemon_name"].nunique(),
+        # Pokémon, von denen der User im Filter mindestens eine Karte besitzt
+        "pokemon_besitz": df.loc[df_owned, "pokemon_name"].nunique(),
+    }
+
 # Filter zurücksetzen bei Benutzerwechsel
 def reset_filter_session_state(df):
 
@@ -487,6 +1593,10 @@ def reset_filter_session_state(df):
     for key, value in reset_defaults.items():
         st.session_state[key] = value
 
+def _goto_page(page_no: int) -> None:
+    """on_click-Callback der Seiten-Buttons (läuft vor dem Rerun)."""
+    st.session_state["page"] = page_no
+
 # CSS Styling
 st.markdown("""
     <style>
@@ -512,6 +1622,16 @@ st.markdown("""
         object-fit: contain;
         margin-right: 10px;
     }
+    .trend-up {
+        color: #2e7d32;
+    }
+    .trend-down {
+        color: #c62828;
+    }
+    .card-box .card-zoom {
+        cursor: zoom-in;
+        flex-shrink: 0;
+    }
     .owned {
         background-color: #e6ffed !important;
         border: 2px solid #4CAF50 !important;
@@ -571,7 +1691,8 @@ st.markdown("""
 
 
 # Session State Initialisierung
-auth_gate()  # muss davor stehen
+with metrics.span("auth"):
+    auth_gate()  # muss davor stehen
 logout_ui()
 
 sb_user = st.session_state.get("sb_user")
@@ -584,27 +1705,26 @@ user = sb_user.get("id") if isinstance(sb_user, dict) else sb_user.id
 if st.session_state.get("just_logged_in") and not st.session_state.get("filters_restored_this_login"):
     saved = load_filter_prefs_from_supabase(user)
     if saved:
-        allowed_keys = {
-            "price_min", "price_max", "id_min", "id_max",
-            "Besitzfilter", "pokemon_name",
-            "multiselect_set", "multiselect_generation", "multiselect_rarity"
-        }
         for k, v in saved.items():
-            if k in allowed_keys:
+            if k in FILTER_STATE_KEYS:
                 st.session_state[k] = v
 
     st.session_state["filters_restored_this_login"] = True
     st.session_state["just_logged_in"] = False
     st.rerun()
 
-# Plan (basic/pro) laden – fallback ist basic, damit die App nicht blockiert
-plan = load_or_create_user_plan(user)
-st.session_state["plan"] = plan
-
 # --- Stripe Redirect Handling ---
 # Stripe success_url / cancel_url setzt ?stripe=success oder ?stripe=cancel
 stripe_state = st.query_params.get("stripe")
 
+# Plan (basic/pro) laden – fallback ist basic, damit die App nicht blockiert.
+# Nach erfolgreicher Zahlung nicht den (veralteten) gecachten Plan nehmen.
+if stripe_state == "success":
+    invalidate_user_plan()
+with metrics.span("plan"):
+    plan = get_user_plan(user)
+st.session_state["plan"] = plan
+
 if stripe_state == "success":
     st.success("✅ Zahlung erfolgreich! Pro wird aktiviert …")
 
@@ -622,12 +1742,12 @@ elif stripe_state == "cancel":
 
 
 if "besitz" not in st.session_state:
-    st.session_state["besitz"] = load_besitz_from_supabase(user)
+    # Servermodus: kein Komplett-Download, Besitz kommt seitenweise mit den Karten
+    with metrics.span("besitz"):
+        set_besitz(set() if SERVER_FILTERING else load_besitz_from_supabase(user))
 
 # Daten einlesen
-try:
-    df = pd.read_csv("overview_cards.csv")
-except FileNotFoundError:
+if not os.path.exists(CATALOG_CSV):
     dummy_data = {
         'pokemon_id': [1, 1, 2],
         'pokemon_name': ['Bisasam', 'Bisasam', 'Glurak'],
@@ -646,11 +1766,11 @@ except FileNotFoundError:
             d = ImageDraw.Draw(img)
             d.text((10, 10), os.path.basename(img_path), fill=(0, 0, 0))
             img.save(img_path)
-    df.to_csv("overview_cards.csv", index=False)
+    df.to_csv(CATALOG_CSV, index=False)
 
-# Besitz ID vorbereiten
-original_df = df.copy()
-df["karte_id"] = df["set_name"].astype(str) + "_" + df["card_number"].astype(str)
+# Typisierter Katalog inkl. karte_id, einmal pro Prozess geladen (read-only!)
+with metrics.span("catalog"):
+    catalog = load_catalog()
 
 # Benutzer
 st.sidebar.subheader("👤 Benutzer")
@@ -680,7 +1800,7 @@ if st.sidebar.button("Filter speichern", key="btn_save_filters"):
 
 
 if st.sidebar.button("Alle Filter zurücksetzen"):
-    reset_filter_session_state(original_df)
+    reset_filter_session_state(catalog)
     st.rerun()
 
 # Besitzfilter (setzt standardmäßig auf "Alle Karten")
@@ -694,7 +1814,8 @@ besitz_filter = st.sidebar.selectbox(
     key="Besitzfilter"
 )
 
-besessene_karten = set(st.session_state["besitz"])
+# Besitz als Bool-Spalte passend zum Katalog-Index (nur bei Besitz-Änderung neu berechnet)
+catalog_owned = owned_mask(catalog)
 
 # Filter auf Bearbeitungsmodus
 if "show_buttons" not in st.session_state:
@@ -709,26 +1830,33 @@ st.session_state["show_buttons"] = st.sidebar.checkbox(
 if not is_pro:
     st.sidebar.caption("🔒 *Kollektion bearbeiten* ist ein Pro-Feature.")
 
-# Filter anwenden auf Kopie von original_df
-df = original_df.copy()
-df["karte_id"] = df["set_name"].astype(str) + "_" + df["card_number"].astype(str)
+with st.sidebar:
+    render_besitz_sync_status(user)
 
+# Filter als Bool-Masken über den vorberechneten Index kombinieren;
+# der gefilterte Frame wird erst ganz am Ende einmal aus dem Katalog geschnitten.
+filter_span = metrics.span("filter").begin()
+filter_index = load_filter_index()
+mask = filter_index.all()
+# dieselben Filter für den Servermodus (Parameter von catalog_stats / catalog_cards_owned)
+server_filter = {"owned": {"Nur Besitz": True, "Nur Nicht-Besitz": False}.get(besitz_filter)}
 
-if besitz_filter == "Nur Besitz":
-    df = df[df["karte_id"].isin(besessene_karten)]
-elif besitz_filter == "Nur Nicht-Besitz":
-    df = df[~df["karte_id"].isin(besessene_karten)]
+if not SERVER_FILTERING:  # im Servermodus filtert der Server nach Besitz
+    if besitz_filter == "Nur Besitz":
+        mask &= catalog_owned.to_numpy()
+    elif besitz_filter == "Nur Nicht-Besitz":
+        mask &= ~catalog_owned.to_numpy()
 
 st.sidebar.markdown("---")
 
 # Filter Sidebar
 st.sidebar.header("🔍 Filter")
-search_input = st.sidebar.selectbox("Pokémon suchen", [""] + sorted(df['pokemon_name'].unique()), key="pokemon_name")
+search_input = st.sidebar.selectbox("Pokémon suchen", [""] + filter_index.options("pokemon_name", mask), key="pokemon_name")
 if search_input:
-    df = df[df['pokemon_name'] == search_input]
+    mask &= filter_index.isin("pokemon_name", [search_input])
+    server_filter["pokemon_name"] = search_input
 
-generations = df.get("generation", pd.Series(dtype=str)).dropna().unique().tolist()
-opts = sorted(generations)
+opts = filter_index.options("generation", mask)
 
 # Initial-Default nur beim ersten Mal setzen
 if "multiselect_generation" not in st.session_state:
@@ -747,7 +1875,8 @@ if opts:
         key="multiselect_generation",
     )
     if selected_generation:
-        df = df[df["generation"].isin(selected_generation)]
+        mask &= filter_index.isin("generation", selected_generation)
+        server_filter["generation"] = selected_generation
 
 
 # generations = df.get("generation", pd.Series()).dropna().unique()
@@ -760,141 +1889,103 @@ if opts:
 #     if selected_generation:
 #         df = df[df["generation"].isin(selected_generation)]
 
-sets = sorted(df["set_name"].dropna().unique().tolist())
+sets = filter_index.options("set_name", mask)
 if "multiselect_set" not in st.session_state:
     st.session_state["multiselect_set"] = []
 st.session_state["multiselect_set"] = [s for s in st.session_state["multiselect_set"] if s in sets]
 selected_set = st.sidebar.multiselect("Set auswählen", sets, key="multiselect_set")
 if selected_set:
-    df = df[df["set_name"].isin(selected_set)]
+    mask &= filter_index.isin("set_name", selected_set)
+    server_filter["set_name"] = selected_set
 
-rarities = sorted(df["rarity"].dropna().unique().tolist())
+rarities = filter_index.options("rarity", mask)
 if "multiselect_rarity" not in st.session_state:
     st.session_state["multiselect_rarity"] = []
 st.session_state["multiselect_rarity"] = [r for r in st.session_state["multiselect_rarity"] if r in rarities]
 
 selected_rarities = st.sidebar.multiselect("Seltenheiten auswählen", rarities, key="multiselect_rarity")
 if selected_rarities:
-    df = df[df["rarity"].isin(selected_rarities)]
+    mask &= filter_index.isin("rarity", selected_rarities)
+    server_filter["rarity"] = selected_rarities
 
 # Preisfilter
 st.sidebar.subheader("Preisbereich (€)")
-df['price'] = pd.to_numeric(df['price'], errors='coerce')
-if df.empty or df['price'].dropna().empty:
+price_range = filter_index.value_range("price", mask)
+if price_range is None:
     price_min, price_max = 0, 0
 else:
-    price_min, price_max = math.floor(df['price'].min()), math.ceil(df['price'].max())
+    price_min, price_max = math.floor(price_range[0]), math.ceil(price_range[1])
 min_input = st.sidebar.number_input("Min €", value=price_min, key="price_min")
 max_input = st.sidebar.number_input("Max €", value=price_max, key="price_max")
-df = df[(df["price"] >= min_input) & (df["price"] <= max_input)]
+mask &= filter_index.between("price", min_input, max_input)
+server_filter["price_min"], server_filter["price_max"] = min_input, max_input
 
 # ID Filter
 st.sidebar.subheader("🔢Pokémon ID")
-df['pokemon_id'] = pd.to_numeric(df['pokemon_id'], errors='coerce')
-if df.empty or df['pokemon_id'].dropna().empty:
+id_range = filter_index.value_range("pokemon_id", mask)
+if id_range is None:
     id_min, id_max = 0, 0
 else:
-    id_min, id_max = int(df['pokemon_id'].min()), int(df['pokemon_id'].max())
+    id_min, id_max = int(id_range[0]), int(id_range[1])
 id_min_input = st.sidebar.number_input("Min ID", value=id_min, key="id_min")
 id_max_input = st.sidebar.number_input("Max ID", value=id_max, key="id_max")
-df = df[(df["pokemon_id"] >= id_min_input) & (df["pokemon_id"] <= id_max_input)]
+mask &= filter_index.between("pokemon_id", id_min_input, id_max_input)
+server_filter["id_min"], server_filter["id_max"] = id_min_input, id_max_input
+
+df = catalog[mask]
+filter_key = filter_state_key(mask, catalog_mtime())
+filter_span.end()
+
+if st.session_state.get("show_buttons") and is_pro:
+    with st.sidebar:
+        render_besitz_bulk(
+            user,
+            df,
+            catalog["set_name"].cat.categories.sort_values().tolist(),
+            server_filter if SERVER_FILTERING else None,
+            filter_key,
+        )
+    if st.session_state.get("bulk_result"):
+        st.sidebar.success(st.session_state.pop("bulk_result"))
+    if st.session_state.get("bulk_error"):
+        st.sidebar.error(st.session_state.pop("bulk_error"))
 
 st.sidebar.markdown("---")
 
+if APP_ENV == "beta":
+    with st.sidebar.expander("🛠 Bild-Cache"):
+        st.json(image_cache().stats())
+
 # --- Statistiken in der Sidebar anzeigen ---
 st.sidebar.markdown("### 📊 Zusammenfassung")
 
-anzahl_pokemon = df["pokemon_name"].nunique()
-gesamtwert = df["price"].sum()
-gruppen = df.groupby("pokemon_name")
-min_pro_gruppe = gruppen["price"].min().sum()
-max_pro_gruppe = gruppen["price"].max().sum()
-
-st.sidebar.markdown(f"**Anzahl der Karten:** {len(df)}")
-st.sidebar.markdown(f"**Abgedeckte Pokémon:** {anzahl_pokemon}")
-st.sidebar.markdown(f"**Gesamtwert aller Karten:** {gesamtwert:.0f}€")
-st.sidebar.markdown(f"**Range (1 Karte / Pokemon):** {min_pro_gruppe:.0f}€ - {max_pro_gruppe:.0f}€")
-if 'update' in df.columns and not df['update'].isnull().all():
+# Nur neu rechnen, wenn sich Filter (bzw. für den Fortschritt: Besitz) geändert haben
+summary_span = metrics.span("summary").begin()
+if SERVER_FILTERING and server_filter["owned"] is not None:
+    # mit Besitzfilter kennt nur der Server die gefilterten Karten
     try:
-        df['update_parsed'] = pd.to_datetime(df['update'], format='%d.%m.%Y', errors='coerce')
-        latest_update = df['update_parsed'].max()
-        if pd.notna(latest_update):
-            st.sidebar.markdown(f"**Letztes Preisupdate:** {latest_update.strftime('%d.%m.%Y')}")
+        stats = server_catalog_stats(server_filter, filter_key, df)
     except Exception as e:
-        st.sidebar.warning(f"Fehler beim Ermitteln des letzten Updates: {e}")
-
-# Berechnung basierend auf der aktuell gefilterten DataFrame "df"
-gefilterte_karten = df["karte_id"].unique()
-gefilterte_pokemon = df["pokemon_name"].unique()
-
-besessene_karten = set(st.session_state["besitz"]) if user else set()
-besessene_aus_filter = [k for k in gefilterte_karten if k in besessene_karten]
-
-# Pokémon-Namen bestimmen, die der User aus dem Filter besitzt
-pokemon_mit_besitz = df[df["karte_id"].isin(besessene_aus_filter)]["pokemon_name"].unique()
-
-karten_fortschritt = len(besessene_aus_filter) / len(gefilterte_karten) if len(gefilterte_karten) > 0 else 0
-pokemon_fortschritt = len(pokemon_mit_besitz) / len(gefilterte_pokemon) if len(gefilterte_pokemon) > 0 else 0
-
-if True:
-
-    st.sidebar.markdown("**🃏 Karten gesammelt**")
-    st.sidebar.progress(karten_fortschritt)
-    st.sidebar.caption(f"{len(besessene_aus_filter)} von {len(gefilterte_karten)} Karten ({karten_fortschritt*100:.0f}%)")
-
-    st.sidebar.markdown("**🔢 Pokémon abgedeckt**")
-    st.sidebar.progress(pokemon_fortschritt)
-    st.sidebar.caption(f"{len(pokemon_mit_besitz)} von {len(gefilterte_pokemon)} Pokémon ({pokemon_fortschritt*100:.0f}%)")
-
-# Gruppierung und Anzeige der Karten
-for pokemon_name, gruppe in df.sort_values(by=["pokemon_name", "card_number"]).groupby("pokemon_name"):
-    st.markdown(f"## {pokemon_name}")
-    for _, row in gruppe.iterrows():
-        img_b64 = img_to_base64(image_for_ui(row["img"]))
-        karte_id = row["karte_id"]
-        owned = karte_id in besessene_karten
-        card_class = "card-box owned" if owned else "card-box"
-        
-        if 'G' in row['card_number']:
-            card_number_str = str(row['card_number']) if pd.notna(row['card_number']) else ''
-        else:
-            card_number_str = str(int(row['card_number'])) if pd.notna(row['card_number']) else ''
-        
-        set_size_str = str(row['set_size']) if pd.notna(row['set_size']) else ''
-        price_str = f"{row['price']:.1f}" if pd.notna(row['price']) else 'N/A'
-        rarity_str = row['rarity'] if pd.notna(row['rarity']) else 'Unknown'
-        update_str = row.get('update', '-')
-
-        card_html = f"""
-        <div class="{card_class}">
-            <img src="{img_b64}" />
-            <div class="card-text">
-                <b>{row['pokemon_name']}</b><br>
-                <i>{row['set_name']} #{card_number_str}/{set_size_str}</i><br>
-                <b>{price_str}€</b><span> (vom {update_str})</span><br>
-                <span>{rarity_str}</span>
-            </div>
-        </div>
-        """
-        st.markdown(card_html, unsafe_allow_html=True)
-
-        if st.session_state.get("show_buttons", True):
-            button_id = f"btn_{karte_id}"
-            button_text = "❌ Aus Kollektion entfernen" if owned else "➕ Zur Kollektion hinzufügen"
-
-            if st.button(button_text, key=f"button_{karte_id}"):
-                try:
-
-                    if owned:
-                        st.session_state["besitz"].remove(karte_id)
-                        save_besitz_change_to_supabase(user, karte_id, add=False)
-                    else:
-                        st.session_state["besitz"].append(karte_id)
-                        save_besitz_change_to_supabase(user, karte_id, add=True)
-
-                    st.rerun()
-
-                except Exception as e:
-                    st.warning(f"Speichern fehlgeschlagen: {e}")
-
+        st.sidebar.error(f"Fehler beim Laden vom Server: {e}")
+        stats = summary_stats(df.iloc[:0])
+else:
+    stats = memoize_in_session("summary_memo", filter_key, lambda: summary_stats(df))
+
+st.sidebar.markdown(f"**Anzahl der Karten:** {stats['anzahl_karten']}")
+st.sidebar.markdown(f"**Abgedeckte Pokémon:** {stats['anzahl_pokemon']}")
+st.sidebar.markdown(f"**Gesamtwert aller Karten:** {stats['gesamtwert']:.0f}€")
+st.sidebar.markdown(f"**Range (1 Karte / Pokemon):** {stats['min_pro_gruppe']:.0f}€ - {stats['max_pro_gruppe']:.0f}€")
+if stats["latest_update"] is not None:
+    # update ist bereits beim Laden des Katalogs als Datum geparst
+    st.sidebar.markdown(f"**Letztes Preisupdate:** {stats['latest_update'].strftime('%d.%m.%Y')}")
+summary_span.end()
+
+render_card_grid(
+    df,
+    filter_key,
+    server_filter if SERVER_FILTERING else None,
+    st.session_state.get("besitz_edit_version", 0) if besitz_filter != "Alle Karten" else None,
+)
 
+if metrics.ENABLED:
+    st.session_state.pop("metrics_rerun").finish()
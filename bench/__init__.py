@@ -0,0 +1 @@
+"""Benchmarks für app.py (headless gegen einen lokalen Supabase-Stub), siehe bench/run.py."""
@@ -0,0 +1,66 @@
+"""
+Kataloge für Benchmarks: der echte Katalog (Faktor 1) und synthetische Vielfache davon.
+
+Ein synthetischer Katalog xN wiederholt jede Zeile der echten CSV N-mal; Kopie k > 1
+bekommt den Set-Namen "<Set> (k)" -> eindeutige karte_ids, N-mal so viele Sets,
+gleiche Pokémon und Bilder. Er liegt mit eigener Arrow-Datei in .bench/catalogs/xN/;
+img/, static/ und assets/ sind Symlinks ins Repo (Bild-Manifest wird mitbenutzt).
+"""
+import csv
+import os
+from pathlib import Path
+
+from catalog import CATALOG_ARROW, CATALOG_CSV, build_catalog_arrow
+
+ROOT = Path(__file__).resolve().parent.parent
+CATALOG_DIR = ROOT / ".bench" / "catalogs"
+LINKED_DIRS = ("img", "static", "assets")
+
+
+def catalog_dir(factor: int) -> Path:
+    """Arbeitsverzeichnis der App für einen Katalog (Faktor 1 = Repo selbst)."""
+    if factor == 1:
+        return ROOT
+    return CATALOG_DIR / f"x{factor}"
+
+
+def prepare_catalog(factor: int) -> Path:
+    """Baut den synthetischen Katalog (nur wenn die echte CSV neuer ist); Returns sein Verzeichnis."""
+    src = ROOT / CATALOG_CSV
+    target = catalog_dir(factor)
+    if factor == 1:
+        if not (ROOT / CATALOG_ARROW).exists() or os.path.getmtime(ROOT / CATALOG_ARROW) < os.path.getmtime(src):
+            build_catalog_arrow(src, ROOT / CATALOG_ARROW, report=lambda msg: None)
+        return target
+
+    target.mkdir(parents=True, exist_ok=True)
+    for name in LINKED_DIRS:
+        link = target / name
+        if not link.exists() and (ROOT / name).exists():
+            link.symlink_to(ROOT / name, target_is_directory=True)
+
+    out_csv = target / CATALOG_CSV
+    if out_csv.exists() and os.path.getmtime(out_csv) >= os.path.getmtime(src):
+        return target
+
+    with open(src, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    set_col = header.index("set_name")
+
+    tmp = out_csv.with_name(f"{out_csv.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        for k in range(1, factor + 1):
+            for row in rows:
+                if k > 1:
+                    row = row.copy()
+                    row[set_col] = f"{row[set_col]} ({k})"
+                writer.writerow(row)
+    build_catalog_arrow(tmp, target / CATALOG_ARROW, report=lambda msg: None)
+    tmp.replace(out_csv)
+    # Arrow-Datei darf nicht älter als die CSV sein, sonst liest die App die CSV
+    os.utime(target / CATALOG_ARROW)
+    return target
@@ -0,0 +1,263 @@
+"""
+Lastgenerator für die Kapazitätsplanung: N gleichzeitig eingeloggte Sessions in einem
+Prozess (wie ein Streamlit-Container: alle Sessions teilen sich Prozess, GIL und
+Caches) gegen den lokalen Supabase-Stub.
+
+Jede Session ist ein eigener User mit eigener Kollektion und läuft in einem eigenen
+Thread: Login per Cookie, Kollektion bearbeiten einschalten, dann bis zum Ende der
+Laufzeit zufällige Schritte mit Denkpause dazwischen:
+    filter  Set / Besitzfilter / Pokémon wechseln oder Filter leeren
+    toggle  eine Karte der Seite hinzufügen bzw. entfernen
+    scroll  nächste Seite (am Ende zurück auf Seite 1)
+
+Gemessen wird jeder Rerun: Durchsatz, p50/p95/p99, dazu der Speicher: RSS des Prozesses
+und der Session-State je Session (ohne geteilte Katalog-Frames) nach dem Login und am Ende.
+Mehrere Stufen nacheinander zeigen, ab wann Reruns sich stauen:
+    python -m bench.load --sessions 1,5,10,20 [--duration 60] [--think-ms 1000] [--latency-ms 20]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from bench.catalogs import ROOT, prepare_catalog
+from bench.run import git_rev
+from bench.session import (
+    BenchError,
+    allow_concurrent_sessions,
+    card_buttons,
+    checkbox,
+    install,
+    new_session,
+    timed_run,
+)
+from bench.stub import SupabaseStub
+from catalog import read_catalog
+
+RESULTS_PATH = ROOT / "bench" / "load_results.jsonl"
+STEP_WEIGHTS = {"filter": 3, "toggle": 3, "scroll": 4}
+OWNED_EVERY = 10
+
+
+def rss_mb() -> float:
+    """Aktueller RSS des Prozesses in MB (Linux), sonst der bisherige Höchststand."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def state_size(value, seen: set | None = None) -> int:
+    """
+    Bytes, die ein Session-State-Wert belegt (rekursiv über Container). DataFrames
+    werden nicht gezählt: im Session-State sind das Verweise auf den geteilten Katalog.
+    """
+    seen = set() if seen is None else seen
+    if id(value) in seen or isinstance(value, pd.DataFrame):
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(state_size(k, seen) + state_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(state_size(v, seen) for v in value)
+    return size
+
+
+def session_state_bytes(at) -> int:
+    seen = set()
+    return sum(state_size(v, seen) for _, v in at.session_state.items())
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-Rank
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+class LoadSession(threading.Thread):
+    """Ein simulierter Sammler: eigene Session, eigener Zufallsgenerator, eigene Messwerte."""
+
+    def __init__(self, index: int, refresh_token: str, deadline: float, think_ms: float, seed: int):
+        super().__init__(name=f"load-session-{index}", daemon=True)
+        self.index = index
+        self.refresh_token = refresh_token
+        self.deadline = deadline
+        self.think_ms = think_ms
+        self.rng = random.Random(seed)
+        self.latencies: dict[str, list[float]] = {"login": [], **{step: [] for step in STEP_WEIGHTS}}
+        self.errors: list[str] = []
+        self.state_bytes = (0, 0)
+
+    def run(self) -> None:
+        try:
+            at = new_session(self.refresh_token)
+            self.latencies["login"].append(timed_run(at))
+            timed_run(checkbox(at, "Kollektion bearbeiten").check())
+            start_bytes = session_state_bytes(at)
+            self.state_bytes = (start_bytes, start_bytes)
+        except Exception as e:
+            self.errors.append(f"login: {e}")
+            return
+
+        steps, weights = zip(*STEP_WEIGHTS.items())
+        while True:
+            # Denkpause: exponentiell verteilt um think_ms (höchstens bis zum Ende der Stufe)
+            think = self.rng.expovariate(1000 / self.think_ms) if self.think_ms else 0
+            time.sleep(max(0.0, min(think, self.deadline - time.monotonic())))
+            if time.monotonic() >= self.deadline:
+                break
+            step = self.rng.choices(steps, weights)[0]
+            try:
+                self.latencies[step].append(timed_run(getattr(self, step)(at)))
+            except (BenchError, IndexError, KeyError, StopIteration) as e:
+                self.errors.append(f"{step}: {e!r}")
+        self.state_bytes = (self.state_bytes[0], session_state_bytes(at))
+
+    # --- Schritte: Returns das Element, dessen .run() den Rerun auslöst ---
+    def filter(self, at):
+        kind = self.rng.choice(["set", "besitz", "pokemon", "reset"])
+        if kind == "set":
+            options = at.multiselect(key="multiselect_set").options
+            return at.multiselect(key="multiselect_set").set_value([self.rng.choice(options)])
+        if kind == "besitz":
+            return at.selectbox(key="Besitzfilter").select(self.rng.choice(["Alle Karten", "Nur Besitz", "Nur Nicht-Besitz"]))
+        if kind == "pokemon":
+            options = [o for o in at.selectbox(key="pokemon_name").options if o]
+            return at.selectbox(key="pokemon_name").select(self.rng.choice(options))
+        at.selectbox(key="pokemon_name").select("")
+        at.selectbox(key="Besitzfilter").select("Alle Karten")
+        return at.multiselect(key="multiselect_set").set_value([])
+
+    def toggle(self, at):
+        return self.rng.choice(card_buttons(at)).click()
+
+    def scroll(self, at):
+        next_buttons = [b for b in at.button if b.key == "btn_page_next" and not b.disabled]
+        if next_buttons:
+            return next_buttons[0].click()
+        return at.number_input(key="page").set_value(1)
+
+
+def run_stage(n_sessions: int, args, stub: SupabaseStub, karte_ids: pd.Series, stage: int) -> dict:
+    tokens = [
+        stub.add_user(f"load-{stage}-{i}", f"load-{stage}-{i}@bench.local",
+                      owned=karte_ids[i % OWNED_EVERY :: OWNED_EVERY], plan="pro")
+        for i in range(n_sessions)
+    ]
+    rss_before = rss_mb()
+    calls_before = stub.calls.total()
+    started = time.monotonic()
+    sessions = [
+        LoadSession(i, token, started + args.duration, args.think_ms, seed=args.seed + stage * 1000 + i)
+        for i, token in enumerate(tokens)
+    ]
+    for s in sessions:
+        s.start()
+        # Logins leicht versetzt, wie echte Nutzer (nicht alle in derselben Millisekunde)
+        time.sleep(args.ramp_ms / 1000)
+    for s in sessions:
+        s.join()
+    wall = time.monotonic() - started
+
+    steps = sorted(ms * 1000 for s in sessions for step in STEP_WEIGHTS for ms in s.latencies[step])
+    logins = sorted(ms * 1000 for s in sessions for ms in s.latencies["login"])
+    growth = [(s.state_bytes[1] - s.state_bytes[0]) / 1024 for s in sessions]
+    errors = [e for s in sessions for e in s.errors]
+    return {
+        "sessions": n_sessions,
+        "duration_s": round(wall, 1),
+        "reruns": len(steps) + len(logins),
+        "throughput_rps": round((len(steps) + len(logins)) / wall, 2),
+        "p50_ms": round(percentile(steps, 50), 1),
+        "p95_ms": round(percentile(steps, 95), 1),
+        "p99_ms": round(percentile(steps, 99), 1),
+        "max_ms": round(steps[-1], 1) if steps else 0.0,
+        "login_p50_ms": round(percentile(logins, 50), 1),
+        "login_p95_ms": round(percentile(logins, 95), 1),
+        "sb_calls": stub.calls.total() - calls_before,
+        "rss_mb": round(rss_mb(), 1),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+        "rss_growth_mb_per_session": round((rss_mb() - rss_before) / n_sessions, 2),
+        "state_kb_per_session": round(sum(s.state_bytes[1] for s in sessions) / 1024 / n_sessions, 1),
+        "state_growth_kb_per_session": round(sum(growth) / len(growth), 1) if growth else 0.0,
+        "errors": len(errors),
+        "error_samples": errors[:3],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lastgenerator: N parallele Sessions gegen den Supabase-Stub")
+    parser.add_argument("--sessions", default="1,5,10", help="Stufen, z.B. 1,5,10,20")
+    parser.add_argument("--duration", type=float, default=30, help="Sekunden pro Stufe")
+    parser.add_argument("--think-ms", type=float, default=1000, help="mittlere Denkpause zwischen Schritten")
+    parser.add_argument("--ramp-ms", type=float, default=50, help="Versatz zwischen den Logins")
+    parser.add_argument("--latency-ms", type=float, default=0, help="künstliche Latenz je Supabase-Request")
+    parser.add_argument("--size", type=int, default=1, help="Katalog-Faktor (1, 10, 100, ...)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=str(RESULTS_PATH))
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    out = Path(args.out).resolve()
+    stub = SupabaseStub(latency_ms=args.latency_ms).start()
+    install(stub)
+    allow_concurrent_sessions()
+    os.chdir(prepare_catalog(args.size))
+    karte_ids = read_catalog()["karte_id"].drop_duplicates()
+
+    # Prozess-Caches (Katalog, Filter-Index, Bild-Manifest) einmal vorab füllen:
+    # gemessen wird der laufende Server, nicht sein Start
+    warmup_token = stub.add_user("load-warmup", "load-warmup@bench.local", plan="pro")
+    timed_run(new_session(warmup_token))
+
+    meta = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rev": git_rev(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "catalog": f"x{args.size}",
+        "think_ms": args.think_ms,
+        "latency_ms": args.latency_ms,
+    }
+    print(f"{'Sessions':>8} {'Reruns/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'Login p95':>10} "
+          f"{'RSS (+/Session)':>16} {'State/Session':>14} {'Fehler':>6}")
+    records = []
+    try:
+        for stage, n in enumerate(int(s) for s in args.sessions.split(",") if s):
+            result = meta | run_stage(n, args, stub, karte_ids, stage)
+            records.append(result)
+            print(f"{n:>8} {result['throughput_rps']:>9.2f} {result['p50_ms']:>6.0f}ms {result['p95_ms']:>6.0f}ms "
+                  f"{result['p99_ms']:>6.0f}ms {result['login_p95_ms']:>8.0f}ms "
+                  f"{result['rss_mb']:>6.0f}MB (+{result['rss_growth_mb_per_session']:.1f}) "
+                  f"{result['state_kb_per_session']:>7.0f}KB (+{result['state_growth_kb_per_session']:.0f}) "
+                  f"{result['errors']:>6}", flush=True)
+            for sample in result["error_samples"]:
+                print(f"         Fehler: {sample}")
+    finally:
+        stub.stop()
+
+    if not args.no_save:
+        with open(out, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"{len(records)} Stufen -> {out}")
+
+
+if __name__ == "__main__":
+    main()
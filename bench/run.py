@@ -0,0 +1,232 @@
+"""
+Rerun-Benchmarks für app.py: headless (AppTest) gegen einen lokalen Supabase-Stub,
+mit dem echten Katalog und synthetischen Vielfachen (x10, x100).
+
+Szenarien (je Katalog, gemessen wird nur der eine Rerun):
+    cold_load      frischer Prozess: Caches leer, neue Session mit Login-Cookie
+                   (Token-Refresh, User, Plan, Besitz, Katalog, Filter-Index, Bild-Manifest, Seite 1)
+    warm_load      neue Session (Reload/zweiter Tab) bei warmen Prozess-Caches
+    filter_change  Set-Filter wechseln
+    card_toggle    eine Karte zur Kollektion hinzufügen bzw. entfernen
+    alle_karten    Besitzfilter "Nur Besitz" -> "Alle Karten" bei 96 Karten pro Seite
+
+AppTest führt immer das ganze Skript aus, auch wo im Browser nur ein Fragment
+neu läuft (Karten-Toggle, Seitenwechsel) -> Werte sind eine obere Schranke.
+
+Ergebnisse werden an bench/results.jsonl angehängt (eine Zeile je Katalog und Szenario)
+und mit dem letzten Lauf auf demselben Rechner verglichen:
+    python -m bench.run [--sizes 1,10,100] [--repeat 5] [--latency-ms 20] [--fail-on-regression]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import streamlit as st
+
+from bench.catalogs import ROOT, prepare_catalog
+from bench.session import (
+    BenchError,
+    card_buttons,
+    checkbox,
+    clear_process_caches,
+    install,
+    new_session,
+    timed_run,
+)
+from bench.stub import SupabaseStub
+from catalog import read_catalog
+
+RESULTS_PATH = ROOT / "bench" / "results.jsonl"
+BENCH_USER_ID = "00000000-0000-0000-0000-000000000001"
+BENCH_USER_EMAIL = "bench@bench.local"
+# jede OWNED_EVERY-te Karte des Katalogs gehört dem Bench-User
+OWNED_EVERY = 10
+# Verschlechterung gegenüber dem letzten Lauf, ab der gewarnt wird (relativ und absolut)
+REGRESSION_THRESHOLD = 0.2
+REGRESSION_MIN_MS = 10
+
+
+class Bench:
+    """Zustand eines Benchmark-Laufs für einen Katalog (Stub, User, geladene Session)."""
+
+    def __init__(self, stub: SupabaseStub, refresh_token: str):
+        self.stub = stub
+        self.refresh_token = refresh_token
+        self.at = None  # geladene Session für die Interaktions-Szenarien
+        self.last_calls = 0
+
+    def measure(self, element_or_app) -> float:
+        """Der gemessene Rerun eines Szenarios (merkt sich dessen Supabase-Calls)."""
+        before = self.stub.calls.total()
+        elapsed = timed_run(element_or_app)
+        self.last_calls = self.stub.calls.total() - before
+        return elapsed
+
+    def session(self):
+        if self.at is None:
+            self.at = new_session(self.refresh_token)
+            timed_run(self.at)
+            # Kollektion bearbeiten -> Karten-Buttons (Bench-User ist pro)
+            timed_run(checkbox(self.at, "Kollektion bearbeiten").check())
+        return self.at
+
+    # --- Szenarien: Returns Dauer des gemessenen Reruns in Sekunden ---
+    def cold_load(self, i: int) -> float:
+        clear_process_caches()
+        return self.measure(new_session(self.refresh_token))
+
+    def warm_load(self, i: int) -> float:
+        return self.measure(new_session(self.refresh_token))
+
+    def filter_change(self, i: int) -> float:
+        at = self.session()
+        sets = at.multiselect(key="multiselect_set").options
+        return self.measure(at.multiselect(key="multiselect_set").set_value([sets[i % 2]]))
+
+    def card_toggle(self, i: int) -> float:
+        at = self.session()
+        return self.measure(card_buttons(at)[0].click())
+
+    def alle_karten(self, i: int) -> float:
+        at = self.session()
+        if at.multiselect(key="multiselect_set").value:
+            timed_run(at.multiselect(key="multiselect_set").set_value([]))
+        if at.selectbox(key="page_size").value != 96:
+            timed_run(at.selectbox(key="page_size").select(96))
+        timed_run(at.selectbox(key="Besitzfilter").select("Nur Besitz"))
+        return self.measure(at.selectbox(key="Besitzfilter").select("Alle Karten"))
+
+
+SCENARIOS = ["cold_load", "warm_load", "filter_change", "card_toggle", "alle_karten"]
+
+
+def git_rev() -> str:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{rev}-dirty" if dirty else rev
+
+
+def load_results(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_result(results: list[dict], record: dict) -> dict | None:
+    """Letztes Ergebnis desselben Rechners für denselben Katalog, dasselbe Szenario, dieselbe Latenz."""
+    keys = ("host", "catalog", "scenario", "latency_ms")
+    matches = [r for r in results if all(r.get(k) == record[k] for k in keys)]
+    return matches[-1] if matches else None
+
+
+def is_regression(record: dict, prev: dict | None, threshold: float) -> bool:
+    if prev is None:
+        return False
+    diff = record["median_ms"] - prev["median_ms"]
+    return diff > REGRESSION_MIN_MS and diff > threshold * prev["median_ms"]
+
+
+def run_catalog(factor: int, scenarios: list[str], repeat: int, stub: SupabaseStub) -> list[dict]:
+    # die App liest den Katalog relativ zum Arbeitsverzeichnis
+    os.chdir(prepare_catalog(factor))
+    karte_ids = read_catalog()["karte_id"].drop_duplicates()
+    refresh_token = stub.add_user(BENCH_USER_ID, BENCH_USER_EMAIL, owned=karte_ids[::OWNED_EVERY], plan="pro")
+    bench = Bench(stub, refresh_token)
+
+    records = []
+    for scenario in scenarios:
+        durations, calls = [], []
+        for i in range(repeat):
+            durations.append(getattr(bench, scenario)(i))
+            calls.append(bench.last_calls)
+        ms = sorted(d * 1000 for d in durations)
+        records.append({
+            "catalog": f"x{factor}",
+            "rows": len(karte_ids),
+            "scenario": scenario,
+            "repeat": repeat,
+            "median_ms": round(statistics.median(ms), 1),
+            "min_ms": round(ms[0], 1),
+            "max_ms": round(ms[-1], 1),
+            "sb_calls": statistics.median(calls),
+        })
+    return records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rerun-Benchmarks für app.py (headless, Supabase-Stub)")
+    parser.add_argument("--sizes", default="1,10,100", help="Katalog-Faktoren, z.B. 1,10,100")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0, help="künstliche Latenz je Supabase-Request")
+    parser.add_argument("--out", default=str(RESULTS_PATH))
+    parser.add_argument("--no-save", action="store_true", help="Ergebnisse nicht anhängen")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit-Code 1 bei Regression")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unbekannte Szenarien: {', '.join(sorted(unknown))}")
+
+    out = Path(args.out).resolve()
+    history = load_results(out)
+    meta = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rev": git_rev(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "streamlit": st.__version__,
+        "latency_ms": args.latency_ms,
+    }
+
+    stub = SupabaseStub(latency_ms=args.latency_ms).start()
+    install(stub)
+    records = []
+    regressions = 0
+    try:
+        for factor in (int(s) for s in args.sizes.split(",") if s):
+            for result in run_catalog(factor, scenarios, args.repeat, stub):
+                record = meta | result
+                prev = previous_result(history, record)
+                regression = is_regression(record, prev, args.threshold)
+                regressions += regression
+                line = f"{record['catalog']:>5} {record['rows']:>7} {record['scenario']:<14} {record['median_ms']:>9.1f} ms"
+                line += f"  [{record['min_ms']:.1f}–{record['max_ms']:.1f}]  {record['sb_calls']:g} Supabase-Calls"
+                if prev is not None:
+                    change = record["median_ms"] / prev["median_ms"] - 1 if prev["median_ms"] else 0
+                    line += f"  (vorher {prev['median_ms']:.1f} ms @ {prev['rev']}, {change:+.0%})"
+                if regression:
+                    line += "  REGRESSION"
+                print(line, flush=True)
+                records.append(record)
+    except BenchError as e:
+        print(f"Abbruch: App-Fehler im Benchmark: {e}")
+        sys.exit(2)
+    finally:
+        stub.stop()
+
+    if not args.no_save:
+        with open(out, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"{len(records)} Ergebnisse -> {out}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
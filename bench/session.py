@@ -0,0 +1,124 @@
+"""
+app.py headless ausführen (streamlit.testing AppTest) gegen den Supabase-Stub.
+
+EncryptedCookieManager ist eine Browser-Komponente und wird headless nie "ready";
+für Benchmarks ersetzt HeadlessCookies sie: die Cookies einer Session liegen in
+deren st.session_state[COOKIE_STATE_KEY] (Login wie im Browser über das
+refresh_token-Cookie, also über try_restore_login_from_cookie).
+
+AppTest kompiliert app.py bei jedem Rerun neu (eigener ScriptCache pro Lauf), der
+Server nur einmal pro Prozess -> install() gibt allen Läufen einen gemeinsamen Cache.
+Das vermeidet auch parallele ast.parse-Aufrufe, die unter Python 3.11 aus mehreren
+Threads sporadisch mit SystemError abbrechen (bench/load.py).
+"""
+import os
+import sys
+import time
+import types
+
+import streamlit as st
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest, local_script_runner
+
+from bench.catalogs import ROOT
+from bench.stub import ANON_KEY, SupabaseStub
+
+APP_PATH = ROOT / "app.py"
+COOKIE_STATE_KEY = "_bench_cookies"
+
+
+class HeadlessCookies(dict):
+    """Ersatz für EncryptedCookieManager mit derselben Schnittstelle (dict + ready/save)."""
+
+    def __init__(self, prefix: str = "", password: str | None = None):
+        super().__init__(st.session_state.get(COOKIE_STATE_KEY) or {})
+
+    def ready(self) -> bool:
+        return True
+
+    def save(self) -> None:
+        st.session_state[COOKIE_STATE_KEY] = dict(self)
+
+
+class BenchError(RuntimeError):
+    """Die App hat im Benchmark eine Exception, einen Fehler oder eine Warnung gerendert."""
+
+
+def install(stub: SupabaseStub) -> None:
+    """Prozess für headless-Läufe gegen den Stub einrichten (vor dem ersten AppTest)."""
+    os.environ["SUPABASE_URL"] = stub.url
+    os.environ["SUPABASE_ANON_KEY"] = ANON_KEY
+    os.environ.setdefault("COOKIE_SECRET", "bench")
+    # Bild-Cache des Repos auch für die synthetischen Kataloge (eigenes Arbeitsverzeichnis)
+    os.environ.setdefault("IMAGE_CACHE_DIR", str(ROOT / ".cache" / "images"))
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    shared_cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: shared_cache
+    module = types.ModuleType("streamlit_cookies_manager")
+    module.EncryptedCookieManager = HeadlessCookies
+    sys.modules["streamlit_cookies_manager"] = module
+
+
+def allow_concurrent_sessions() -> None:
+    """
+    AppTest ist für einen Lauf zur Zeit gebaut: jeder Lauf setzt Runtime._instance und die
+    Option global.appTest und räumt beides am Ende ab, auch mitten in Läufen anderer
+    Threads. Für parallele Sessions (bench/load.py) bleibt beides gesetzt: appTest=True
+    und als Runtime die zuletzt gesehene Mock-Runtime (alle Läufe bauen sie gleich auf).
+    """
+    config.set_option("global.appTest", True)
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+            return cls._instance
+        if "runtime" in last:
+            return last["runtime"]
+        raise RuntimeError("Runtime hasn't been created!")
+
+    def exists(cls):
+        return cls._instance is not None or "runtime" in last
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+
+def clear_process_caches() -> None:
+    """Wie ein frisch gestarteter Server-Prozess: alle st.cache_resource/st.cache_data leeren."""
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+
+def new_session(refresh_token: str, timeout: float = 300) -> AppTest:
+    """Neue Browser-Session mit gesetztem Login-Cookie (noch nicht ausgeführt)."""
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    at.session_state[COOKIE_STATE_KEY] = {"refresh_token": refresh_token}
+    return at
+
+
+def checkbox(at: AppTest, label: str):
+    return next(c for c in at.checkbox if c.label == label)
+
+
+def card_buttons(at: AppTest) -> list:
+    """Die Buttons "Zur Kollektion hinzufügen"/"Aus Kollektion entfernen" der angezeigten Seite."""
+    return [b for b in at.button if b.key and b.key.startswith("button_")]
+
+
+def timed_run(element_or_app) -> float:
+    """
+    Führt einen Rerun aus (at.run() bzw. widget.run() nach set_value/click) und
+    Returns die Dauer in Sekunden. Wirft BenchError, wenn die App dabei fehlschlägt.
+    """
+    start = time.perf_counter()
+    at = element_or_app.run()
+    elapsed = time.perf_counter() - start
+    # st.warning meldet in app.py fehlgeschlagene Supabase-Calls (Besitz, Plan)
+    errors = [e.message for e in at.exception] + [e.value for e in (*at.error, *at.warning)]
+    if errors:
+        raise BenchError("; ".join(str(e) for e in errors))
+    return elapsed
@@ -0,0 +1,261 @@
+"""
+Lokaler Supabase-Ersatz für Benchmarks: ein kleiner HTTP-Server, der die Auth- und
+REST-Endpunkte beantwortet, die app.py anspricht (refresh_session_with_token,
+fetch_user, _sb_request):
+
+    POST /auth/v1/token?grant_type=refresh_token    GET /auth/v1/user
+    GET/POST /rest/v1/user_profile                  GET/POST /rest/v1/user_filter_prefs
+    GET/POST/DELETE /rest/v1/user_cards             GET /rest/v1/user_cards_deleted
+
+PostgREST-Verhalten nur so weit, wie die App es braucht: eq./in./gte.-Filter,
+Range-Header (inkl. 416), on_conflict-Upsert, Date-Header als Server-Zeit.
+Tokens sind echte (HS256-signierte) JWTs mit sub/email/exp; abgelaufene Tokens -> 401.
+Alles im Speicher, pro Prozess; optional mit künstlicher Latenz pro Request.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import re
+import secrets
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+ANON_KEY = "bench-anon-key"
+JWT_SECRET = b"bench-jwt-secret"
+ACCESS_TOKEN_TTL_SEC = 3600
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def make_jwt(claims: dict) -> str:
+    header = _b64url(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    payload = _b64url(json.dumps(claims).encode())
+    sig = hmac.new(JWT_SECRET, f"{header}.{payload}".encode(), hashlib.sha256).digest()
+    return f"{header}.{payload}.{_b64url(sig)}"
+
+
+def verify_jwt(token: str) -> dict | None:
+    """Claims eines gültigen, nicht abgelaufenen Tokens, sonst None."""
+    try:
+        header, payload, sig = token.split(".")
+        expected = hmac.new(JWT_SECRET, f"{header}.{payload}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(_b64url_decode(sig), expected):
+            return None
+        claims = json.loads(_b64url_decode(payload))
+    except ValueError:
+        return None
+    return claims if claims.get("exp", 0) > time.time() else None
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _parse_in(value: str) -> set[str]:
+    """in.("a","b",c) -> {"a", "b", "c"} (gequotete Werte wie in app._postgrest_in)."""
+    inner = value[len("in.("):-1]
+    return {
+        quoted.replace('\\"', '"').replace("\\\\", "\\") if quoted else plain
+        for quoted, plain in re.findall(r'"((?:[^"\\]|\\.)*)"|([^,]+)', inner)
+    }
+
+
+class SupabaseStub:
+    """
+    Supabase-Ersatz im Hintergrund-Thread:
+        stub = SupabaseStub(latency_ms=20).start()
+        refresh_token = stub.add_user("u1", "u1@bench.local", owned=ids, plan="pro")
+        ... SUPABASE_URL=stub.url, SUPABASE_ANON_KEY=ANON_KEY ...
+        stub.stop()
+    stub.calls zählt die Requests je "METHOD /pfad"; max_rows kürzt Seiten wie PostgREST max-rows.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+                 token_ttl_sec: int = ACCESS_TOKEN_TTL_SEC, max_rows: int | None = None):
+        self.latency_ms = latency_ms
+        self.token_ttl_sec = token_ttl_sec
+        self.max_rows = max_rows
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        self._users: dict[str, dict] = {}
+        self._refresh_tokens: dict[str, str] = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "SupabaseStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="supabase-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    # --- Testdaten ---
+    def add_user(self, user_id: str, email: str, owned=(), plan: str = "pro") -> str:
+        """Legt einen User an; Returns sein refresh_token (für das Login-Cookie)."""
+        # Bestand ist alt -> Delta-Syncs sehen nur Änderungen aus dem Benchmark selbst
+        seeded = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+        with self._lock:
+            self._users[user_id] = {
+                "email": email,
+                "plan": plan,
+                "cards": {k: seeded for k in owned},
+                "deleted": {},
+                "filters": None,
+            }
+            refresh_token = secrets.token_urlsafe(16)
+            self._refresh_tokens[refresh_token] = user_id
+        return refresh_token
+
+    def owned(self, user_id: str) -> set[str]:
+        with self._lock:
+            return set(self._users[user_id]["cards"])
+
+    def _issue_session(self, user_id: str, refresh_token: str) -> dict:
+        user = self._users[user_id]
+        exp = int(time.time()) + self.token_ttl_sec
+        access_token = make_jwt({"sub": user_id, "email": user["email"], "role": "authenticated", "exp": exp})
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": self.token_ttl_sec,
+            "expires_at": exp,
+            "refresh_token": refresh_token,
+            "user": {"id": user_id, "email": user["email"], "aud": "authenticated"},
+        }
+
+    # --- Request-Verarbeitung: Returns (Status, JSON-Body, Extra-Header) ---
+    def handle(self, method: str, path: str, params: list[tuple[str, str]], headers, body) -> tuple[int, object, dict]:
+        if path == "/auth/v1/token":
+            with self._lock:
+                # kein Rotieren/Entwerten: parallele Sessions eines Users teilen sich ein Token
+                user_id = self._refresh_tokens.get((body or {}).get("refresh_token", ""))
+                if user_id is None:
+                    return 400, {"error": "invalid_grant", "error_description": "Invalid Refresh Token"}, {}
+                return 200, self._issue_session(user_id, body["refresh_token"]), {}
+
+        auth = headers.get("Authorization", "")
+        claims = verify_jwt(auth.removeprefix("Bearer ")) if auth.startswith("Bearer ") else None
+        if claims is None:
+            return 401, {"message": "JWT expired"}, {}
+        user_id = claims["sub"]
+
+        if path == "/auth/v1/user":
+            return 200, {"id": user_id, "email": claims.get("email"), "aud": "authenticated"}, {}
+
+        filters = {k: v for k, v in params if k not in ("select", "order", "limit", "on_conflict")}
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                return 401, {"message": "unknown user"}, {}
+            if path == "/rest/v1/user_profile":
+                if method == "POST":
+                    return 201, [], {}
+                return 200, [{"plan": user["plan"]}], {}
+            if path == "/rest/v1/user_filter_prefs":
+                if method == "POST":
+                    user["filters"] = body[0].get("filters")
+                    return 201, [], {}
+                return 200, ([{"filters": user["filters"]}] if user["filters"] is not None else []), {}
+            if path == "/rest/v1/user_cards":
+                return self._user_cards(method, user, filters, headers, body)
+            if path == "/rest/v1/user_cards_deleted":
+                rows = [{"karte_id": k} for k, ts in sorted(user["deleted"].items())
+                        if ts >= filters.get("deleted_at", "gte.").removeprefix("gte.")]
+                return self._range(rows, headers)
+        return 404, {"message": f"{method} {path} wird vom Stub nicht unterstützt"}, {}
+
+    def _user_cards(self, method, user, filters, headers, body):
+        now = _now_iso()
+        prefer = headers.get("Prefer", "")
+        if method == "POST":
+            written = 0
+            for row in body or []:
+                if "resolution=ignore-duplicates" in prefer and row["karte_id"] in user["cards"]:
+                    continue
+                user["cards"][row["karte_id"]] = now
+                user["deleted"].pop(row["karte_id"], None)
+                written += 1
+            return 201, [], self._count(written, prefer)
+        if method == "DELETE":
+            deleted = 0
+            for karte_id in _parse_in(filters.get("karte_id", "in.()")):
+                if user["cards"].pop(karte_id, None) is not None:
+                    user["deleted"][karte_id] = now
+                    deleted += 1
+            return 204, None, self._count(deleted, prefer)
+        since = filters.get("updated_at", "gte.").removeprefix("gte.")
+        rows = [{"karte_id": k} for k, ts in sorted(user["cards"].items()) if ts >= since]
+        return self._range(rows, headers)
+
+    @staticmethod
+    def _count(n: int, prefer: str) -> dict:
+        # Prefer: count=exact bei Schreibzugriffen -> Anzahl betroffener Zeilen als "*/n"
+        return {"Content-Range": f"*/{n}"} if "count=exact" in prefer else {}
+
+    def _range(self, rows: list[dict], headers) -> tuple[int, object, dict]:
+        m = re.fullmatch(r"(\d+)-(\d+)", headers.get("Range", ""))
+        if not m:
+            return 200, rows, {}
+        start, end = int(m.group(1)), int(m.group(2))
+        if start > 0 and start >= len(rows):
+            return 416, {"message": "Requested range not satisfiable"}, {"Content-Range": f"*/{len(rows)}"}
+        # wie PostgREST max-rows: nie mehr Zeilen als max_rows, egal welche Range
+        end = min(end, start + self.max_rows - 1) if self.max_rows else end
+        page = rows[start : end + 1]
+        last = start + len(page) - 1
+        total = str(len(rows)) if "count=exact" in headers.get("Prefer", "") else "*"
+        return 200, page, {"Content-Range": f"{start}-{last}/{total}" if page else f"*/{total}"}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-Alive wie bei Supabase
+            disable_nagle_algorithm = True  # sonst ~40 ms Delayed-ACK pro Antwort
+
+            def _dispatch(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw else None
+                with stub._lock:
+                    stub.calls[f"{self.command} {parts.path}"] += 1
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+                status, payload, extra = stub.handle(
+                    self.command, parts.path, parse_qsl(parts.query), self.headers, body
+                )
+                data = b"" if payload is None else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in extra.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_DELETE = do_PATCH = _dispatch
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,424 @@
+"""
+Karten-Katalog (overview_cards.csv): Einlesen mit festen Datentypen.
+
+Bewusst ohne Streamlit, damit die Funktionen auch aus Build-/Import-Skripten
+heraus benutzt werden können. Das Caching pro Prozess passiert in app.py.
+
+Build-Schritt (läuft auch im Docker-Build): liest die CSV blockweise (Speicher bleibt
+auch bei 50k+ Zeilen begrenzt), prüft und normalisiert jede Zeile und schreibt sie
+typisiert als Arrow-IPC-Datei (Feather v2, unkomprimiert), die die App per memory-map
+öffnet, statt die CSV bei jedem Start zu parsen. Fehlerhafte Zeilen werden mit
+Zeilennummer gemeldet und übersprungen:
+    python catalog.py [--chunk-rows 10000]
+"""
+import argparse
+import csv
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+CATALOG_CSV = "overview_cards.csv"
+CATALOG_ARROW = "overview_cards.arrow"
+
+# Spalten mit wenigen, oft wiederholten Werten -> category spart Speicher und
+# macht isin()/groupby() deutlich schneller.
+CATEGORY_COLUMNS = ["generation", "set_name", "rarity", "pokemon_name"]
+
+# card_number ("GG70") und set_size ("-") sind keine reinen Zahlen -> bleiben Text
+STRING_COLUMNS = ["card_name", "card_number", "set_size", "img", "update", "price_changed"]
+
+# Text-Spalten Arrow-basiert: aus der Arrow-Datei verweisen sie ohne Kopie auf die
+# memory-gemappten Puffer (siehe read_catalog_arrow); die CSV liefert denselben Typ.
+STRING_DTYPE = pd.StringDtype("pyarrow")
+
+UPDATE_FORMAT = "%d.%m.%Y"
+
+# Datumsspalten (TT.MM.JJJJ); price_changed = Datum der letzten Preisänderung (prices.py)
+DATE_COLUMNS = ["update", "price_changed"]
+
+# Spalten, auf denen die Sidebar Bereichsfilter (min/max) anbietet
+RANGE_COLUMNS = ["price", "pokemon_id"]
+
+# Pflichtspalten (ohne sie gibt es keine karte_id bzw. keine sinnvolle Anzeige)
+REQUIRED_COLUMNS = ["set_name", "card_number", "pokemon_name", "price"]
+
+# Zeilen pro Block beim Build
+CHUNK_ROWS = 10_000
+
+# Schema der Arrow-Datei = Typen nach prepare_catalog(categorize=False). Kategorie-Spalten
+# liegen als Text in der Datei (das IPC-Dateiformat erlaubt keine je Block wechselnden
+# Dictionaries) und werden beim Laden zu category. Text als large_string: das ist die
+# Darstellung von STRING_DTYPE, pandas übernimmt die Puffer dann ohne Umwandlung/Kopie.
+CATALOG_SCHEMA = pa.schema([
+    ("generation", pa.large_string()),
+    ("set_name", pa.large_string()),
+    ("card_name", pa.large_string()),
+    ("pokemon_id", pa.int64()),
+    ("pokemon_name", pa.large_string()),
+    ("card_number", pa.large_string()),
+    ("set_size", pa.large_string()),
+    ("price", pa.float64()),
+    ("rarity", pa.large_string()),
+    ("img", pa.large_string()),
+    ("update", pa.timestamp("us")),
+    ("price_prev", pa.float64()),
+    ("price_changed", pa.timestamp("us")),
+    ("karte_id", pa.large_string()),
+])
+
+
+def make_karte_id(set_name: pd.Series, card_number: pd.Series) -> pd.Series:
+    """karte_id = "<set_name>_<card_number>" (so wird sie auch in user_cards gespeichert)."""
+    return set_name.astype(str) + "_" + card_number.astype(str)
+
+
+def parse_price(values: pd.Series) -> pd.Series:
+    """Preise (nach normalize_rows) als float; nicht lesbare Werte -> NaN."""
+    return pd.to_numeric(values, errors="coerce").astype("float64")
+
+
+def prepare_catalog(df: pd.DataFrame, categorize: bool = True) -> pd.DataFrame:
+    """
+    Bringt einen roh eingelesenen Katalog in die Form, mit der die App arbeitet:
+    - category für generation/set_name/rarity/pokemon_name (categorize=False: Text)
+    - price/price_prev (float) und pokemon_id (Int64) numerisch
+    - update/price_changed als Datum geparst
+    - price_prev/price_changed leer angelegt, falls die CSV sie (noch) nicht hat
+    - karte_id vorberechnet
+    """
+    for col in ["price_prev", "price_changed"]:
+        if col not in df.columns:
+            df[col] = pd.NA
+
+    for col in STRING_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(STRING_DTYPE)
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = _categorize(df[col]) if categorize else df[col].astype(STRING_DTYPE)
+
+    for col in ["price", "price_prev"]:
+        df[col] = parse_price(df[col])
+    df["pokemon_id"] = pd.to_numeric(df["pokemon_id"], errors="coerce").astype("Int64")
+
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format=UPDATE_FORMAT, errors="coerce").astype("datetime64[us]")
+
+    df["karte_id"] = make_karte_id(df["set_name"], df["card_number"]).astype(STRING_DTYPE)
+    return df
+
+
+def _categorize(values: pd.Series) -> pd.Series:
+    """category mit sortierten Kategorien als Text (object) – gleich für CSV- und Arrow-Pfad."""
+    values = values.astype("category")
+    categories = pd.Index(sorted(values.cat.categories.astype(str)), dtype=object)
+    return values.cat.set_categories(categories)
+
+
+def read_catalog_csv(path: str | Path = CATALOG_CSV, report=print, stats: dict | None = None) -> pd.DataFrame:
+    """
+    Liest die Katalog-CSV blockweise über dieselbe Prüfung wie der Build (iter_catalog_chunks)
+    und gibt einen typisierten DataFrame zurück – identisch zu read_catalog_arrow derselben
+    Datei. Der Frame wird prozessweit geteilt -> Aufrufer dürfen ihn nicht verändern.
+    """
+    chunks = list(iter_catalog_chunks(path, report=report, stats=stats))
+    if chunks:
+        df = pd.concat(chunks, ignore_index=True)
+    else:
+        df = pd.DataFrame({col: pd.Series(dtype=STRING_DTYPE) for col in CATALOG_SCHEMA.names})
+        df = prepare_catalog(df, categorize=False)
+    for col in CATEGORY_COLUMNS:
+        df[col] = _categorize(df[col])
+    return df
+
+
+def normalize_rows(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vereinheitlicht rohe CSV-Werte vor dem Typisieren: Leerraum abschneiden, leere
+    Felder -> fehlend, Dezimalkomma in Preisen -> Punkt ("54,90" -> "54.90").
+    """
+    for col in raw.columns:
+        values = raw[col].astype("string").str.strip()
+        raw[col] = values.mask(values == "")
+    for col in ["price", "price_prev"]:
+        if col in raw.columns:
+            raw[col] = raw[col].str.replace(",", ".", regex=False)
+    return raw
+
+
+def check_rows(raw: pd.DataFrame, df: pd.DataFrame, lines: np.ndarray) -> tuple[np.ndarray, list[str]]:
+    """
+    Prüft jede Zeile (raw = normalisierter Text, df = nach prepare_catalog, lines = CSV-Zeilennummern).
+    Returns (Maske gültiger Zeilen, Meldungen "Zeile N: ...").
+    """
+    problems = [[] for _ in range(len(raw))]
+
+    for col in ["set_name", "card_number"]:
+        for i in np.flatnonzero(raw[col].isna().to_numpy()):
+            problems[i].append(f"{col} leer")
+
+    # Wert vorhanden, aber nicht lesbar -> wäre nach dem Build stillschweigend leer
+    for col in ["price", "pokemon_id", "price_prev"] + DATE_COLUMNS:
+        if col in raw.columns:
+            bad = raw[col].notna().to_numpy() & df[col].isna().to_numpy()
+            for i in np.flatnonzero(bad):
+                problems[i].append(f"{col} nicht lesbar ({raw[col].iat[i]!r})")
+
+    for i in np.flatnonzero((df["price"] < 0).fillna(False).to_numpy()):
+        problems[i].append("negativer Preis")
+
+    messages = [f"Zeile {lines[i]}: {', '.join(p)}" for i, p in enumerate(problems) if p]
+    valid = np.array([not p for p in problems], dtype=bool)
+    return valid, messages
+
+
+def iter_csv_chunks(path: str | Path, chunk_rows: int = CHUNK_ROWS):
+    """
+    Liest die CSV blockweise. Yields (Rohdaten als Text, CSV-Zeilennummern, Meldungen für
+    Zeilen mit falscher Spaltenanzahl). Wirft ValueError, wenn Pflichtspalten fehlen.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        missing = [c for c in REQUIRED_COLUMNS if c not in header]
+        if missing:
+            raise ValueError(f"Pflichtspalten fehlen: {', '.join(missing)}")
+
+        rows, lines, messages = [], [], []
+        for row in reader:
+            if not any(row):
+                continue
+            if len(row) != len(header):
+                messages.append(f"Zeile {reader.line_num}: {len(row)} statt {len(header)} Spalten")
+                continue
+            rows.append(row)
+            lines.append(reader.line_num)
+            if len(rows) >= chunk_rows:
+                yield pd.DataFrame(rows, columns=header, dtype="string"), np.array(lines), messages
+                rows, lines, messages = [], [], []
+        if rows or messages:
+            yield pd.DataFrame(rows, columns=header, dtype="string"), np.array(lines), messages
+
+
+def iter_catalog_chunks(
+    csv_path: str | Path = CATALOG_CSV,
+    chunk_rows: int = CHUNK_ROWS,
+    report=print,
+    stats: dict | None = None,
+):
+    """
+    Die eine Prüfung für jeden Weg in den Katalog (Build, CSV-Fallback, prices.py):
+    jeder Block wird normalisiert, geprüft und typisiert (categorize=False, Spalten wie
+    CATALOG_SCHEMA); fehlerhafte Zeilen werden über report gemeldet und übersprungen.
+    Yields die gültigen Zeilen je Block; zählt rows/skipped/duplicates in stats.
+    """
+    stats = {} if stats is None else stats
+    for key in ("rows", "skipped", "duplicates"):
+        stats.setdefault(key, 0)
+    seen_ids = set()
+    for raw, lines, messages in iter_csv_chunks(csv_path, chunk_rows):
+        for col in CATALOG_SCHEMA.names:
+            if col not in raw.columns and col != "karte_id":
+                raw[col] = pd.Series(pd.NA, index=raw.index, dtype="string")
+        raw = normalize_rows(raw)
+        df = prepare_catalog(raw.copy(), categorize=False)
+        valid, row_messages = check_rows(raw, df, lines)
+        for msg in messages + row_messages:
+            report(f"Übersprungen: {msg}")
+        stats["skipped"] += len(messages) + int((~valid).sum())
+
+        df = df[valid]
+        for karte_id, line in zip(df["karte_id"], lines[valid]):
+            if karte_id in seen_ids:
+                stats["duplicates"] += 1
+                report(f"Warnung: Zeile {line}: karte_id {karte_id} doppelt")
+            seen_ids.add(karte_id)
+
+        stats["rows"] += len(df)
+        yield df[CATALOG_SCHEMA.names]
+
+
+def build_catalog_arrow(
+    csv_path: str | Path = CATALOG_CSV,
+    out_path: str | Path = CATALOG_ARROW,
+    chunk_rows: int = CHUNK_ROWS,
+    report=print,
+) -> dict:
+    """
+    Streaming-Build CSV -> Arrow: jeder geprüfte Block (iter_catalog_chunks) wird sofort
+    als Record-Batch geschrieben. Returns Zählwerte (rows, skipped, duplicates).
+    """
+    out_path = Path(out_path)
+    tmp = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    stats = {}
+    try:
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, CATALOG_SCHEMA) as writer:
+            for df in iter_catalog_chunks(csv_path, chunk_rows, report, stats):
+                writer.write_batch(pa.RecordBatch.from_pandas(df, schema=CATALOG_SCHEMA, preserve_index=False))
+        tmp.replace(out_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return stats
+
+
+def _pandas_type(arrow_type: pa.DataType):
+    # string -> STRING_DTYPE (ohne Kopie), int64 mit Lücken -> Int64 statt float
+    if arrow_type == pa.large_string():
+        return STRING_DTYPE
+    if arrow_type == pa.int64():
+        return pd.Int64Dtype()
+    return None
+
+
+def read_catalog_arrow(path: str | Path = CATALOG_ARROW) -> pd.DataFrame:
+    """
+    Öffnet die gebaute Arrow-Datei per memory-map. Die Text-Spalten (der Großteil der
+    Daten) bleiben Arrow-Puffer auf der gemappten Datei: sie liegen im Page-Cache, den
+    sich alle Worker-Prozesse teilen, statt als Kopie im Prozess-Speicher. Kopiert werden
+    nur Zahlen/Datumswerte und die Codes der Kategorie-Spalten (dictionary-kodiert, ohne
+    Umweg über Python-Strings). Wirft ValueError bei abweichendem Schema.
+    """
+    with pa.memory_map(str(path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    if not table.schema.equals(CATALOG_SCHEMA):
+        raise ValueError(f"{path}: Schema passt nicht zur App (neu bauen: python catalog.py)")
+    for col in CATEGORY_COLUMNS:
+        i = table.schema.get_field_index(col)
+        table = table.set_column(i, col, table.column(i).dictionary_encode())
+    df = table.to_pandas(types_mapper=_pandas_type, split_blocks=True)
+    for col in CATEGORY_COLUMNS:
+        df[col] = _categorize(df[col])
+    return df
+
+
+def read_catalog(
+    csv_path: str | Path = CATALOG_CSV,
+    arrow_path: str | Path = CATALOG_ARROW,
+    report=print,
+    stats: dict | None = None,
+) -> pd.DataFrame:
+    """
+    Katalog laden: die gebaute Arrow-Datei, solange sie nicht älter als die CSV ist,
+    sonst (fehlt/veraltet/defekt) die CSV – mit derselben Prüfung wie der Build.
+    Meldungen gehen an report; stats bekommt source ("arrow"/"csv"), beim CSV-Weg die
+    Zählwerte von iter_catalog_chunks und ggf. arrow_error.
+    """
+    stats = {} if stats is None else stats
+    try:
+        if os.path.getmtime(arrow_path) >= os.path.getmtime(csv_path):
+            stats["source"] = "arrow"
+            return read_catalog_arrow(arrow_path)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, pa.ArrowException) as e:
+        stats["arrow_error"] = str(e)
+        report(f"Arrow-Katalog nicht nutzbar, lese CSV: {e}")
+    stats["source"] = "csv"
+    return read_catalog_csv(csv_path, report, stats)
+
+
+class FilterIndex:
+    """
+    Vorberechneter Index über den Katalog für die Sidebar-Filter.
+
+    - Kategorie-Spalten: Wert -> Zeilenpositionen (inverted index) plus die
+      Kategorie-Codes je Zeile, um Optionslisten für eine Maske abzuleiten
+    - price/pokemon_id: sortierte Werte + Zeilenpositionen für Bereichsabfragen
+
+    Alle Masken sind numpy-Bool-Arrays über die Zeilen*positionen* des Katalogs;
+    der gefilterte Frame ist am Ende einfach catalog[mask].
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.size = len(df)
+        self._categories = {}
+        self._codes = {}
+        self._postings = {}
+        for col in CATEGORY_COLUMNS:
+            if col not in df.columns:
+                continue
+            categories = list(df[col].cat.categories)
+            codes = df[col].cat.codes.to_numpy()
+            # Zeilen nach Code gruppieren -> Postings sind Slices einer Sortierung
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+            self._categories[col] = categories
+            self._codes[col] = codes
+            self._postings[col] = {
+                value: order[bounds[i] : bounds[i + 1]] for i, value in enumerate(categories)
+            }
+
+        self._values = {}
+        self._sorted = {}
+        for col in RANGE_COLUMNS:
+            values = df[col].to_numpy(dtype="float64", na_value=np.nan)
+            valid = np.flatnonzero(~np.isnan(values))
+            order = valid[np.argsort(values[valid], kind="stable")]
+            self._values[col] = values
+            self._sorted[col] = (values[order], order)
+
+    def all(self) -> np.ndarray:
+        return np.ones(self.size, dtype=bool)
+
+    def isin(self, col: str, values) -> np.ndarray:
+        """Maske aller Zeilen, deren col einen der Werte hat."""
+        mask = np.zeros(self.size, dtype=bool)
+        postings = self._postings.get(col, {})
+        for value in values:
+            rows = postings.get(value)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def between(self, col: str, low, high) -> np.ndarray:
+        """Maske aller Zeilen mit low <= col <= high (fehlende Werte nie enthalten)."""
+        sorted_values, order = self._sorted[col]
+        start = np.searchsorted(sorted_values, low, side="left")
+        end = np.searchsorted(sorted_values, high, side="right")
+        mask = np.zeros(self.size, dtype=bool)
+        mask[order[start:end]] = True
+        return mask
+
+    def options(self, col: str, mask: np.ndarray) -> list:
+        """Sortierte Werte von col, die in den Zeilen der Maske vorkommen."""
+        if col not in self._codes:
+            return []
+        codes = np.unique(self._codes[col][mask])
+        categories = self._categories[col]
+        return [categories[c] for c in codes if c >= 0]
+
+    def value_range(self, col: str, mask: np.ndarray):
+        """(min, max) von col innerhalb der Maske oder None, wenn es keine Werte gibt."""
+        values = self._values[col][mask]
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return None
+        return values.min(), values.max()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Katalog-CSV prüfen und blockweise als Arrow-Datei bauen")
+    parser.add_argument("--csv", default=CATALOG_CSV)
+    parser.add_argument("--out", default=CATALOG_ARROW)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    try:
+        stats = build_catalog_arrow(args.csv, args.out, args.chunk_rows)
+    except ValueError as e:
+        print(f"Fehler: {e}")
+        sys.exit(1)
+    print(
+        f"{stats['rows']} Karten -> {args.out} ({os.path.getsize(args.out) / 1024:.0f} KiB), "
+        f"{stats['skipped']} Zeilen übersprungen, {stats['duplicates']} doppelte karte_ids"
+    )
+
+
+if __name__ == "__main__":
+    main()
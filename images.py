@@ -0,0 +1,451 @@
+"""
+Bild-Pipeline: erzeugt aus den Originalen in img/ Varianten in mehreren Breiten
+(thumb/list/zoom) unter static/, die Streamlit als statische Dateien ausliefert
+(server.enableStaticServing, siehe .streamlit/config.toml). Die Karten verweisen per
+srcset darauf, statt Base64 inline; die große zoom-Variante lädt erst beim Anklicken.
+
+Die Varianten sind inhaltsadressiert (static/img/<hash>_<variante>.webp): identische
+Bilder (z.B. Reprints mit derselben Datei) werden nur einmal kodiert und gespeichert.
+static/img/manifest.json bildet jeden img-Pfad der CSV auf seinen Hash ab; die App
+liest nur das Manifest und prüft beim Rendern keine Dateien mehr.
+
+CLI (läuft auch im Docker-Build), kodiert parallel auf allen Kernen:
+    python images.py            # fehlende/veraltete Varianten bauen
+    python images.py --force    # alle neu bauen
+"""
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import quote
+
+from PIL import Image
+
+STATIC_DIR = Path("static")
+ASSET_DIR = STATIC_DIR / "img"
+MANIFEST_PATH = ASSET_DIR / "manifest.json"
+MANIFEST_VERSION = 1
+# Länge des Hash-Präfixes in Dateinamen/URLs (hex)
+ASSET_HASH_LEN = 20
+# Streamlit liefert <app-dir>/static/* unter app/static/* aus
+STATIC_URL_PREFIX = "app/static"
+
+# Breiten der Varianten: angezeigt wird max. 120px breit (thumb), list ist die 2x-Variante
+# für hochauflösende Displays, zoom die Großansicht (Originale werden nie hochskaliert).
+IMAGE_WIDTHS = {"thumb": 120, "list": 240, "zoom": 600}
+# Varianten im srcset der Kartenansicht (zoom nur per Link)
+SRCSET_VARIANTS = ("thumb", "list")
+# Breite für den Inline-Fallback / Bild-Cache
+THUMB_WIDTH = IMAGE_WIDTHS["list"]
+THUMB_QUALITY = 75
+# Obergrenze der Festplatten-Ebene des Bild-Caches (ImageCache)
+DISK_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def source_for(img_path: str) -> Path:
+    """Bevorzugt die vorhandene .webp-Variante, sonst das Original."""
+    p = Path(img_path)
+    webp = p.with_suffix(".webp")
+    return webp if webp.exists() else p
+
+
+def manifest_key(img_path: str | Path) -> str:
+    """
+    Schlüssel eines Bildes im Manifest: der relative Pfad (POSIX, ohne "./"), nie nur der
+    Dateiname – gleichnamige Bilder in verschiedenen Ordnern (img/a/1.png, img/b/1.png) bleiben getrennt.
+    """
+    return Path(img_path).as_posix()
+
+
+def content_hash(src: str | Path) -> str:
+    """Hash über den Dateiinhalt des Quellbilds (Adresse der Varianten)."""
+    h = hashlib.sha256()
+    with open(src, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:ASSET_HASH_LEN]
+
+
+def asset_path(digest: str, variant: str) -> Path:
+    return ASSET_DIR / f"{digest}_{variant}.webp"
+
+
+def asset_url(digest: str, variant: str) -> str:
+    """
+    URL einer Variante. Der Inhalt hinter einer URL ändert sich nie (Hash im Namen),
+    d.h. Browser bzw. ein vorgeschalteter Proxy dürfen sie beliebig lange cachen.
+    """
+    rel = asset_path(digest, variant).relative_to(STATIC_DIR).as_posix()
+    return f"{STATIC_URL_PREFIX}/{quote(rel)}"
+
+
+def _encode(img: Image.Image, width: int) -> bytes:
+    img = img.copy()
+    img.thumbnail((width, width * 10), Image.Resampling.LANCZOS)
+    buffered = BytesIO()
+    img.save(buffered, format="WEBP", quality=THUMB_QUALITY, method=6)
+    return buffered.getvalue()
+
+
+def encode_webp(src: str | Path, width: int = THUMB_WIDTH) -> bytes:
+    """Skaliert ein Bild auf die Zielbreite (Seitenverhältnis bleibt) und kodiert es als WebP."""
+    with Image.open(src) as img:
+        return _encode(img.convert("RGB"), width)
+
+
+def _write_atomic(dst: Path, data: bytes) -> None:
+    # erst in temp-Datei schreiben -> parallele Leser/Worker sehen nie halbe Dateien
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f"{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    tmp.replace(dst)
+
+
+class ImageCache:
+    """
+    Größenbegrenzter Cache für kodierte Bilder (WebP-Bytes).
+
+    - Speicher-Ebene: LRU, verdrängt die am längsten nicht genutzten Einträge,
+      sobald max_bytes überschritten ist
+    - optionale Festplatten-Ebene (disk_dir): übersteht Container-Neustarts;
+      Key ist Quellpfad + mtime + Zielbreite, d.h. geänderte Bilder werden neu kodiert.
+      Begrenzt auf disk_max_bytes: darüber werden die am längsten nicht genutzten
+      Dateien gelöscht (mtime, wird bei jedem Treffer erneuert) – auch die verwaisten
+      Einträge alter Bildversionen
+    - optional on_lookup(result) nach jedem get() mit result = hit | disk_hit | miss
+    Thread-safe (Streamlit bedient Sessions aus mehreren Threads).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        disk_dir: str | Path | None = None,
+        on_lookup=None,
+        disk_max_bytes: int = DISK_CACHE_MAX_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self.on_lookup = on_lookup
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        # Größe der Festplatten-Ebene (None = noch nicht gezählt, siehe put_disk)
+        self._disk_bytes: int | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    @staticmethod
+    def key(src: str | Path, width: int) -> str:
+        stat = os.stat(src)
+        raw = f"{Path(src).resolve()}|{stat.st_mtime_ns}|{width}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.webp"
+
+    def get(self, src: str | Path, width: int = THUMB_WIDTH) -> bytes:
+        """Kodierte Bytes für src in der Zielbreite (Speicher -> Festplatte -> neu kodieren)."""
+        key = self.key(src, width)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if data is not None:
+            self._report("hit")
+            return data
+
+        data = None
+        if self.disk_dir is not None:
+            try:
+                path = self._disk_path(key)
+                data = path.read_bytes()
+                # mtime = letzte Nutzung (Reihenfolge fürs Aufräumen)
+                os.utime(path)
+            except OSError:
+                pass
+        if data is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._report("disk_hit")
+        else:
+            data = encode_webp(src, width)
+            with self._lock:
+                self.misses += 1
+            self._report("miss")
+            self.put_disk(key, data)
+
+        self._put_memory(key, data)
+        return data
+
+    def _report(self, result: str) -> None:
+        if self.on_lookup is not None:
+            self.on_lookup(result)
+
+    def put_disk(self, key: str, data: bytes) -> None:
+        if self.disk_dir is None:
+            return
+        try:
+            _write_atomic(self._disk_path(key), data)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(data)
+            over = self._disk_bytes > self.disk_max_bytes
+        if over:
+            self.prune_disk()
+
+    def _disk_files(self) -> list[tuple[float, int, Path]]:
+        files = []
+        for path in self.disk_dir.glob("*/*.webp"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def prune_disk(self, target_ratio: float = 0.8) -> int:
+        """
+        Löscht die am längsten nicht genutzten Dateien der Festplatten-Ebene, bis sie
+        wieder unter target_ratio * disk_max_bytes liegt (Platz für die nächsten Einträge,
+        statt bei jedem Schreiben aufzuräumen). Returns Anzahl gelöschter Dateien.
+        """
+        if self.disk_dir is None:
+            return 0
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * target_ratio
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            # neu gezählt: andere Prozesse/Worker teilen sich das Verzeichnis
+            self._disk_bytes = total
+            self.disk_evictions += removed
+        return removed
+
+    def _put_memory(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir is not None else None,
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+class ImageManifest:
+    """
+    Geladenes static/img/manifest.json: img-Pfad (wie in der CSV) -> Inhalts-Hash.
+    Die URLs aller Varianten werden beim Laden einmal berechnet; Abfragen sind reine
+    Dict-Zugriffe ohne Dateisystem.
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.widths = data.get("widths", {})
+        images = data.get("images", {})
+        self._urls = {}
+        for img_path, entry in images.items():
+            digest = entry["hash"]
+            self._urls[manifest_key(img_path)] = {v: asset_url(digest, v) for v in self.widths}
+        self.asset_count = len({entry["hash"] for entry in images.values()})
+
+    @classmethod
+    def load(cls, path: str | Path = MANIFEST_PATH) -> "ImageManifest":
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        return cls(data)
+
+    def matches(self, widths: dict, quality: int) -> bool:
+        """True, wenn das Manifest mit denselben Breiten/derselben Qualität gebaut wurde."""
+        return (
+            self.data.get("version") == MANIFEST_VERSION
+            and self.widths == widths
+            and self.data.get("quality") == quality
+        )
+
+    def urls(self, img_path: str) -> dict[str, str]:
+        """{Variante: URL} für einen img-Pfad, leer, wenn das Bild nicht im Manifest ist."""
+        return self._urls.get(manifest_key(img_path), {})
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+
+def _encode_job(job: tuple) -> tuple[str, str | None]:
+    """
+    Worker (läuft im Prozess-Pool): dekodiert ein Bild einmal und schreibt alle angeforderten
+    Varianten. Returns (Hash, Fehlermeldung oder None).
+    """
+    digest, src, targets = job
+    try:
+        with Image.open(src) as img:
+            img = img.convert("RGB")
+            for width, dst in targets:
+                _write_atomic(dst, _encode(img, width))
+        return digest, None
+    except Exception as e:
+        return digest, str(e)
+
+
+def build_manifest(
+    img_paths,
+    force: bool = False,
+    workers: int | None = None,
+    report=None,
+) -> ImageManifest:
+    """
+    Baut das Manifest und fehlende Varianten (IMAGE_WIDTHS) für alle übergebenen
+    Katalogpfade – je Inhalts-Hash nur einmal, parallel über alle Kerne (Prozess-Pool).
+    Der Bild-Cache (ImageCache) wird nicht vorgewärmt: er dient nur dem Inline-Fallback für
+    Bilder ohne Varianten, und genau die fehlen hier (keine Quelle oder Kodierfehler).
+    Hashes werden aus dem vorigen Manifest übernommen, solange Quelle, Größe und mtime passen.
+    report(fertig, gesamt, hash, fehler) wird nach jedem kodierten Bild aufgerufen.
+    Bilder ohne Quelldatei oder mit Kodierfehler fehlen im Manifest.
+    """
+    previous = ImageManifest.load()
+    if force or not previous.matches(IMAGE_WIDTHS, THUMB_QUALITY):
+        previous = ImageManifest({})
+    prev_images = {manifest_key(p): e for p, e in previous.data.get("images", {}).items()}
+
+    images = {}
+    sources = {}  # Hash -> Quelle
+    for img_path in dict.fromkeys(manifest_key(p) for p in img_paths):
+        src = source_for(img_path)
+        try:
+            stat = src.stat()
+        except OSError:
+            continue
+        entry = {"source": src.as_posix(), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        prev = prev_images.get(img_path)
+        if prev and all(prev.get(k) == v for k, v in entry.items()):
+            entry["hash"] = prev["hash"]
+        else:
+            entry["hash"] = content_hash(src)
+        images[img_path] = entry
+
+        sources.setdefault(entry["hash"], src)
+
+    jobs = []
+    for digest, src in sources.items():
+        targets = [
+            (width, asset_path(digest, variant))
+            for variant, width in IMAGE_WIDTHS.items()
+            if force or not asset_path(digest, variant).exists()
+        ]
+        if targets:
+            jobs.append((digest, src, targets))
+
+    failed = set()
+    if jobs:
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(jobs) < 8:
+            results = map(_encode_job, jobs)
+            pool = None
+        else:
+            # spawn statt fork: der Streamlit-Server ist multithreaded
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            results = pool.map(_encode_job, jobs, chunksize=8)
+        try:
+            for done, (digest, error) in enumerate(results, start=1):
+                if error:
+                    failed.add(digest)
+                    print(f"Bildvarianten fehlgeschlagen für {sources[digest]}: {error}")
+                if report:
+                    report(done, len(jobs), digest, error)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    data = {
+        "version": MANIFEST_VERSION,
+        "widths": IMAGE_WIDTHS,
+        "quality": THUMB_QUALITY,
+        "images": {p: e for p, e in images.items() if e["hash"] not in failed},
+    }
+    if data != previous.data:
+        _write_atomic(MANIFEST_PATH, json.dumps(data, ensure_ascii=False, indent=1).encode("utf-8"))
+    return ImageManifest(data)
+
+
+def _catalog_img_paths(csv_path: str) -> list[str]:
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return [row["img"] for row in csv.DictReader(f) if row.get("img")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bildvarianten für alle Katalogbilder vorab bauen")
+    parser.add_argument("--csv", default="overview_cards.csv")
+    parser.add_argument("--force", action="store_true", help="auch aktuelle Bilder neu kodieren")
+    parser.add_argument("--workers", type=int, default=None, help="Prozesse (Default: alle Kerne)")
+    args = parser.parse_args()
+
+    paths = _catalog_img_paths(args.csv)
+    started = time.time()
+    last_pct = -1
+
+    def report(done, total, digest, error):
+        nonlocal last_pct
+        pct = done * 100 // total
+        if pct // 5 != last_pct // 5 or done == total:
+            last_pct = pct
+            print(f"{done}/{total} kodiert ({pct}%, {time.time() - started:.1f}s)", flush=True)
+
+    manifest = build_manifest(paths, force=args.force, workers=args.workers, report=report)
+    print(
+        f"{len(manifest)} von {len(set(paths))} Bildern in {MANIFEST_PATH} "
+        f"({manifest.asset_count} eindeutige Dateien, {time.time() - started:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Laufzeit-Metriken der App: Dauer der Phasen jedes Reruns, Latenz und Status jedes
+Supabase-Requests, Bild-Cache-Treffer und gerenderte Karten.
+
+Bewusst ohne Streamlit (wie catalog.py/images.py); app.py startet/beendet die Reruns.
+Eingeschaltet über APP_METRICS (kommagetrennt, Default: aus -> alles No-op):
+    log         eine JSON-Zeile pro Rerun auf stdout (Logger "pika.metrics")
+    prometheus  GET /metrics im Prometheus-Textformat auf METRICS_PORT (Default 9108)
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+METRICS_MODES = {m.strip() for m in os.environ.get("APP_METRICS", "").split(",") if m.strip()}
+ENABLED = bool(METRICS_MODES)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9108"))
+
+# Histogramm-Grenzen in Sekunden (Reruns, Phasen und Requests teilen sich die Skala)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_HELP = {
+    "pika_rerun_seconds": ("histogram", "Dauer eines Reruns (kind=full|fragment, outcome=ok|stop)"),
+    "pika_rerun_phase_seconds": ("histogram", "Dauer einer Phase innerhalb eines Reruns"),
+    "pika_supabase_request_seconds": ("histogram", "Latenz der Supabase-Requests inkl. Retries"),
+    "pika_cards_rendered_total": ("counter", "Gerenderte Karten"),
+    "pika_images_total": ("counter", "Kartenbilder nach Quelle (manifest=statische Datei, fallback=Data-URL)"),
+    "pika_image_cache_lookups_total": ("counter", "Zugriffe auf den Bild-Cache (hit, disk_hit, miss)"),
+}
+
+log = logging.getLogger("pika.metrics")
+if "log" in METRICS_MODES and not log.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+class Registry:
+    """Prozessweite Zähler und Histogramme (thread-safe), Ausgabe im Prometheus-Textformat."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = defaultdict(float)
+        # (Name, Labels) -> [Bucket-Zähler..., +Inf], Summe
+        self._histograms: dict[tuple, list] = {}
+        self._collectors = []
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        with self._lock:
+            self._counters[(name, _labels(labels))] += value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        with self._lock:
+            hist = self._histograms.setdefault((name, _labels(labels)), [[0] * (len(LATENCY_BUCKETS) + 1), 0.0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    hist[0][i] += 1
+            hist[0][-1] += 1
+            hist[1] += seconds
+
+    def add_collector(self, collect) -> None:
+        """collect() -> [(Name, Typ, Hilfetext, Wert)], wird bei jedem Abruf von /metrics aufgerufen."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((k, ([*v[0]], v[1])) for k, v in self._histograms.items())
+            collectors = list(self._collectors)
+
+        def header(name):
+            kind, text = METRIC_HELP.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        last = None
+        for (name, labels), value in counters:
+            if name != last:
+                header(name)
+                last = name
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), (buckets, total) in histograms:
+            if name != last:
+                header(name)
+                last = name
+            for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), buckets):
+                lines.append(f"{name}_bucket{_format_labels([*labels, ('le', bound)])} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {buckets[-1]}")
+        for collect in collectors:
+            try:
+                samples = collect()
+            except Exception:
+                continue
+            for name, kind, text, value in samples:
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class Rerun:
+    """Messwerte eines Reruns; finish() schreibt sie in die Registry bzw. als Log-Zeile."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.last_activity = self.started
+        self.phases: dict[str, float] = defaultdict(float)
+        self.requests: list[tuple] = []
+        self.counts: dict[str, int] = defaultdict(int)
+        self.finished = False
+
+    def finish(self, outcome: str = "ok") -> None:
+        """
+        outcome="stop": Rerun wurde per st.stop()/st.rerun() abgebrochen und erst beim
+        nächsten Rerun abgeschlossen -> Dauer bis zur letzten Messung in diesem Rerun.
+        """
+        if self.finished:
+            return
+        self.finished = True
+        end = time.perf_counter() if outcome == "ok" else self.last_activity
+        seconds = end - self.started
+        if getattr(_local, "rerun", None) is self:
+            _local.rerun = None
+        registry.observe("pika_rerun_seconds", seconds, kind=self.kind, outcome=outcome)
+        if "log" in METRICS_MODES:
+            log.info(json.dumps(self.as_dict(outcome, seconds), ensure_ascii=False))
+
+    def as_dict(self, outcome: str, seconds: float) -> dict:
+        errors = sum(1 for _, _, status, _ in self.requests if status == "error" or int(status) >= 400)
+        return {
+            "event": "rerun",
+            "kind": self.kind,
+            "outcome": outcome,
+            "ms": round(seconds * 1000, 1),
+            "phases_ms": {name: round(s * 1000, 1) for name, s in self.phases.items()},
+            "supabase": {
+                "calls": len(self.requests),
+                "errors": errors,
+                "ms": round(sum(s for *_, s in self.requests) * 1000, 1),
+                "requests": [[m, path, status, round(s * 1000, 1)] for m, path, status, s in self.requests],
+            },
+            **dict(self.counts),
+        }
+
+
+_local = threading.local()
+
+
+def current() -> Rerun | None:
+    """Der Rerun, der gerade in diesem Thread läuft (Streamlit: ein Skript-Thread pro Session)."""
+    rerun = getattr(_local, "rerun", None)
+    return rerun if rerun is not None and not rerun.finished else None
+
+
+def start_rerun(kind: str = "full") -> Rerun | None:
+    if not ENABLED:
+        return None
+    _local.rerun = Rerun(kind)
+    return _local.rerun
+
+
+def count(name: str, n: int = 1, **labels) -> None:
+    """Zähler im laufenden Rerun (Log) und prozessweit als pika_<name>_total."""
+    if not ENABLED or not n:
+        return
+    rerun = current()
+    if rerun is not None:
+        key = "_".join([name, *labels.values()])
+        rerun.counts[key] += n
+        rerun.last_activity = time.perf_counter()
+    registry.inc(f"pika_{name}_total", n, **labels)
+
+
+class Span:
+    """Misst eine Phase des laufenden Reruns (mehrfach gemessene Phasen summieren sich)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = None
+
+    def begin(self) -> "Span":
+        if ENABLED:
+            self.started = time.perf_counter()
+        return self
+
+    def end(self) -> None:
+        if self.started is None:
+            return
+        now = time.perf_counter()
+        seconds = now - self.started
+        self.started = None
+        rerun = current()
+        if rerun is not None:
+            rerun.phases[self.name] += seconds
+            rerun.last_activity = now
+        registry.observe("pika_rerun_phase_seconds", seconds, phase=self.name)
+
+    def __enter__(self) -> "Span":
+        return self.begin()
+
+    def __exit__(self, *exc) -> None:
+        self.end()
+
+
+def span(name: str) -> Span:
+    """
+    with metrics.span("plan"): ...
+    oder über viele Zeilen Top-Level-Code: s = metrics.span("filter").begin() ... s.end()
+    """
+    return Span(name)
+
+
+def fragment(name: str):
+    """
+    Decorator für st.fragment-Funktionen: im vollen Rerun eine Phase, bei einem
+    Fragment-Rerun (Skript läuft nicht von oben) ein eigener Rerun kind=fragment.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            own = start_rerun("fragment") if current() is None else None
+            try:
+                with span(name):
+                    return func(*args, **kwargs)
+            finally:
+                if own is not None:
+                    own.finish()
+        return wrapper
+    return decorator
+
+
+def observe_request(method: str, url: str, status, seconds: float) -> None:
+    path = urlsplit(url).path
+    rerun = current()
+    if rerun is not None:
+        rerun.requests.append((method, path, status, seconds))
+        rerun.last_activity = time.perf_counter()
+    registry.observe("pika_supabase_request_seconds", seconds, method=method, endpoint=path, status=str(status))
+
+
+class TimedSession(requests.Session):
+    """requests.Session, die Latenz und Status jedes Requests misst (status="error" bei Exceptions)."""
+
+    def request(self, method, url, *args, **kwargs):
+        if not ENABLED:
+            return super().request(method, url, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            r = super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            observe_request(method, url, "error", time.perf_counter() - start)
+            raise
+        observe_request(method, url, r.status_code, time.perf_counter() - start)
+        return r
+
+
+def httpx_event_hooks() -> dict:
+    """event_hooks für httpx.Client (supabase-py: Login, Registrierung, Logout)."""
+    if not ENABLED:
+        return {}
+
+    def on_request(request):
+        request.extensions["metrics_started"] = time.perf_counter()
+
+    def on_response(response):
+        started = response.request.extensions.get("metrics_started")
+        if started is not None:
+            observe_request(response.request.method, str(response.request.url), response.status_code,
+                            time.perf_counter() - started)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def image_lookup(result: str) -> None:
+    """Callback für ImageCache(on_lookup=...): result = hit | disk_hit | miss."""
+    count("image_cache_lookups", result=result)
+
+
+def serve(port: int = METRICS_PORT) -> ThreadingHTTPServer | None:
+    """
+    Startet den /metrics-Endpunkt in einem Hintergrund-Thread (einmal pro Prozess aufrufen).
+    Returns None, wenn der Port belegt ist (z.B. zweiter Worker): nur loggen, die App läuft weiter.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    except OSError as e:
+        log.warning("/metrics nicht gestartet (Port %s): %s", port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
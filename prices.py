@@ -0,0 +1,189 @@
+"""
+Preis-Updates inkrementell einspielen, statt overview_cards.csv komplett zu ersetzen.
+
+Eingabe ist eine Delta-CSV mit karte_id (oder set_name + card_number), price und
+optional update (TT.MM.JJJJ, Default: heute). Pro Lauf:
+- nur die betroffenen Katalogzeilen werden geändert (price, update, price_prev,
+  price_changed), alle anderen Werte werden unverändert als Text zurückgeschrieben;
+  die Dateien selbst (CSV und Arrow) werden dabei komplett neu geschrieben
+- mehrere Deltas für dieselbe Karte werden nach Datum nacheinander eingespielt
+- jede echte Preisänderung wird an price_history.csv angehängt (append-only,
+  eine Zeile = karte_id, Datum, alter und neuer Preis)
+- danach wird die Arrow-Datei des Katalogs neu gebaut
+
+Die App liest die Historie nie: Trend (price_prev) und letzte Änderung
+(price_changed) stehen direkt im Katalog.
+
+    python prices.py deltas.csv [--date 15.12.2025] [--dry-run]
+"""
+import argparse
+import csv
+import os
+import sys
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from catalog import (
+    CATALOG_ARROW,
+    CATALOG_CSV,
+    UPDATE_FORMAT,
+    build_catalog_arrow,
+    iter_catalog_chunks,
+    make_karte_id,
+    normalize_rows,
+    parse_price,
+    prepare_catalog,
+)
+
+PRICE_HISTORY = "price_history.csv"
+HISTORY_COLUMNS = ["karte_id", "date", "price_old", "price_new"]
+
+
+def format_price(price: float) -> str:
+    """Preis so formatieren, wie er in der CSV steht (54.9, 5.0)."""
+    return str(round(float(price), 2))
+
+
+def read_deltas(path: str | Path, default_date: str) -> tuple[pd.DataFrame, list[str]]:
+    """
+    Liest eine Delta-CSV. Returns (Deltas mit karte_id/price/update in der Reihenfolge,
+    in der sie einzuspielen sind, Fehler mit Zeilennummer); fehlerhafte Zeilen werden
+    übersprungen, nicht der ganze Lauf. Fehlt eine Pflichtspalte, ist die Datei ungültig.
+    Werte laufen durch dieselbe Normalisierung wie der Katalog ("61,5", Leerraum).
+    """
+    raw = normalize_rows(pd.read_csv(path, dtype=str, keep_default_na=False))
+    empty = pd.DataFrame(columns=["karte_id", "price", "update"])
+    if "karte_id" not in raw.columns:
+        if not {"set_name", "card_number"} <= set(raw.columns):
+            return empty, ["Delta-CSV braucht karte_id oder set_name + card_number"]
+        incomplete = raw["set_name"].isna() | raw["card_number"].isna()
+        raw["karte_id"] = make_karte_id(raw["set_name"], raw["card_number"]).mask(incomplete)
+    if "price" not in raw.columns:
+        return empty, ["Delta-CSV braucht eine Spalte price"]
+    if "update" not in raw.columns:
+        raw["update"] = pd.Series(pd.NA, index=raw.index, dtype="string")
+    raw["update"] = raw["update"].fillna(default_date)
+
+    price = parse_price(raw["price"])
+    parsed = pd.to_datetime(raw["update"], format=UPDATE_FORMAT, errors="coerce")
+    missing_id = raw["karte_id"].isna()
+
+    errors = []
+    for i in range(len(raw)):
+        line = i + 2
+        if missing_id.iat[i]:
+            errors.append(f"Zeile {line}: karte_id leer")
+        elif pd.isna(price.iat[i]) or price.iat[i] < 0:
+            errors.append(f"Zeile {line}: Preis ungültig ({raw.at[i, 'price']!r})")
+        elif pd.isna(parsed.iat[i]):
+            errors.append(f"Zeile {line}: Datum ungültig ({raw.at[i, 'update']!r})")
+
+    ok = price.notna() & (price >= 0) & parsed.notna() & ~missing_id
+    deltas = pd.DataFrame({"karte_id": raw["karte_id"], "price": price, "update": raw["update"], "_date": parsed})[ok]
+    # mehrere Deltas für eine Karte: alle nach Datum einspielen (gleiches Datum: Dateireihenfolge)
+    # -> jede Änderung landet in der Historie, das jüngste Delta bestimmt den Katalogpreis
+    deltas = deltas.sort_values("_date", kind="stable").drop(columns="_date")
+    return deltas.reset_index(drop=True), errors
+
+
+def apply_deltas(raw: pd.DataFrame, deltas: pd.DataFrame) -> tuple[pd.DataFrame, list[list[str]], list[str]]:
+    """
+    Spielt Deltas in den roh (als Text) gelesenen Katalog ein; ändert nur betroffene Zeilen.
+    karte_id und alte Preise kommen aus derselben Normalisierung/Typisierung wie beim
+    Build (normalize_rows + prepare_catalog), geschrieben wird weiter nur der Text.
+    Returns (Katalog, neue Historien-Zeilen, unbekannte karte_ids).
+    """
+    for col in ["price_prev", "price_changed"]:
+        if col not in raw.columns:
+            raw[col] = pd.Series(pd.NA, index=raw.index, dtype="object")
+
+    typed = prepare_catalog(normalize_rows(raw.copy()), categorize=False)
+    rows_by_id = pd.Series(raw.index, index=typed["karte_id"]).groupby(level=0).agg(list).to_dict()
+
+    history = []
+    unknown = []
+    for delta in deltas.itertuples(index=False):
+        rows = rows_by_id.get(delta.karte_id)
+        if rows is None:
+            unknown.append(delta.karte_id)
+            continue
+        new_price = format_price(delta.price)
+        for row in rows:
+            old_price = typed.at[row, "price"]
+            if pd.isna(old_price) or not old_price:
+                # 0 = bisher kein Preis bekannt -> kein Vorgänger für den Trend
+                old_price = None
+            if old_price is None or round(old_price, 2) != round(float(delta.price), 2):
+                raw.at[row, "price_prev"] = format_price(old_price) if old_price is not None else pd.NA
+                raw.at[row, "price_changed"] = delta.update
+                raw.at[row, "price"] = new_price
+                history.append([delta.karte_id, delta.update, format_price(old_price) if old_price is not None else "", new_price])
+            # auch ohne Änderung: Preis wurde zu diesem Datum geprüft
+            raw.at[row, "update"] = delta.update
+    return raw, history, list(dict.fromkeys(unknown))
+
+
+def append_history(rows: list[list[str]], path: str | Path = PRICE_HISTORY) -> None:
+    if not rows:
+        return
+    new_file = not os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        if new_file:
+            writer.writerow(HISTORY_COLUMNS)
+        writer.writerows(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Preis-Deltas in den Katalog einspielen")
+    parser.add_argument("deltas", help="CSV mit karte_id bzw. set_name+card_number, price[, update]")
+    parser.add_argument("--csv", default=CATALOG_CSV)
+    parser.add_argument("--history", default=PRICE_HISTORY)
+    parser.add_argument("--arrow", default=CATALOG_ARROW)
+    parser.add_argument("--date", default=date.today().strftime(UPDATE_FORMAT), help="Datum für Deltas ohne update")
+    parser.add_argument("--dry-run", action="store_true", help="nur anzeigen, nichts schreiben")
+    args = parser.parse_args()
+
+    deltas, errors = read_deltas(args.deltas, args.date)
+    for msg in errors:
+        print(f"Übersprungen: {msg}")
+
+    # alles als Text lesen -> unveränderte Zeilen werden exakt so zurückgeschrieben
+    raw = pd.read_csv(args.csv, dtype=str)
+    raw, history, unknown = apply_deltas(raw, deltas)
+    for karte_id in unknown:
+        print(f"Unbekannte karte_id: {karte_id}")
+
+    print(f"{deltas['karte_id'].nunique() - len(unknown)} Karten geprüft, {len(history)} Preisänderungen")
+    if args.dry_run or deltas.empty:
+        return
+
+    tmp = Path(f"{args.csv}.{os.getpid()}.tmp")
+    tmp_arrow = Path(f"{args.arrow}.{os.getpid()}.new")
+    try:
+        raw.to_csv(tmp, index=False, lineterminator="\n")
+        # neue CSV durch dieselbe Prüfung wie jeder Build/Load; sie darf nicht mehr
+        # ungültige Zeilen haben als die bisherige, sonst bleibt alles unverändert
+        before = {}
+        for _ in iter_catalog_chunks(args.csv, report=lambda msg: None, stats=before):
+            pass
+        stats = build_catalog_arrow(tmp, tmp_arrow)
+        if stats["skipped"] > before["skipped"]:
+            print(f"Abbruch: {stats['skipped'] - before['skipped']} Katalogzeilen wären nach dem Update ungültig")
+            sys.exit(1)
+
+        # erst die Historie, dann der Katalog: bricht der Lauf ab, fehlt nie eine Änderung
+        append_history(history, args.history)
+        tmp.replace(args.csv)
+        # Arrow-Datei zuletzt -> nicht älter als die CSV
+        tmp_arrow.replace(args.arrow)
+    finally:
+        tmp.unlink(missing_ok=True)
+        tmp_arrow.unlink(missing_ok=True)
+    print(f"{stats['rows']} Karten -> {args.arrow}, {stats['skipped']} Zeilen übersprungen")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+-- Serverseitige Besitz-Filter (App mit SERVER_FILTERING=1).
+-- Einmal im Supabase SQL-Editor ausführen; Katalog danach mit upload_catalog.py befüllen.
+--
+-- Annahme: user_cards hat den PK (user, karte_id) und user_cards.user ist die uuid
+-- aus auth.users (bei einer text-Spalte unten auth.uid()::text verwenden).
+
+-- Katalog (nur die Spalten, nach denen gefiltert/sortiert/aggregiert wird)
+create table if not exists public.catalog_cards (
+    karte_id     text primary key,
+    generation   text,
+    set_name     text not null,
+    card_number  text not null,
+    pokemon_id   integer,
+    pokemon_name text,
+    price        numeric,
+    rarity       text,
+    "update"     date
+);
+
+create index if not exists catalog_cards_order_idx on public.catalog_cards (pokemon_name, card_number, karte_id);
+create index if not exists catalog_cards_set_name_idx on public.catalog_cards (set_name);
+
+alter table public.catalog_cards enable row level security;
+
+drop policy if exists "catalog_cards lesbar" on public.catalog_cards;
+create policy "catalog_cards lesbar" on public.catalog_cards
+    for select to anon, authenticated using (true);
+
+-- Katalog + Besitz des eingeloggten Users (security_invoker -> RLS von user_cards greift)
+create or replace view public.catalog_cards_owned
+with (security_invoker = true) as
+select
+    c.*,
+    exists (
+        select 1
+        from public.user_cards u
+        where u."user" = (select auth.uid())
+          and u.karte_id = c.karte_id
+    ) as owned
+from public.catalog_cards c;
+
+grant select on public.catalog_cards_owned to authenticated;
+
+-- Kennzahlen für Zusammenfassung + Sammelfortschritt in einem Aufruf
+-- (Parameter null = Filter nicht gesetzt; entspricht den Sidebar-Filtern der App)
+create or replace function public.catalog_stats(
+    p_owned        boolean default null,
+    p_generation   text[]  default null,
+    p_set_name     text[]  default null,
+    p_rarity       text[]  default null,
+    p_pokemon_name text    default null,
+    p_price_min    numeric default null,
+    p_price_max    numeric default null,
+    p_id_min       integer default null,
+    p_id_max       integer default null
+)
+returns json
+language sql
+stable
+security invoker
+set search_path = public
+as $$
+    with f as (
+        select *
+        from catalog_cards_owned
+        where (p_owned is null or owned = p_owned)
+          and (p_generation is null or generation = any (p_generation))
+          and (p_set_name is null or set_name = any (p_set_name))
+          and (p_rarity is null or rarity = any (p_rarity))
+          and (p_pokemon_name is null or pokemon_name = p_pokemon_name)
+          and (p_price_min is null or price >= p_price_min)
+          and (p_price_max is null or price <= p_price_max)
+          and (p_id_min is null or pokemon_id >= p_id_min)
+          and (p_id_max is null or pokemon_id <= p_id_max)
+    ),
+    per_pokemon as (
+        select pokemon_name, min(price) as lo, max(price) as hi, bool_or(owned) as any_owned
+        from f
+        where pokemon_name is not null
+        group by pokemon_name
+    )
+    select json_build_object(
+        'anzahl_karten',  (select count(*) from f),
+        'karten_besitz',  (select count(*) from f where owned),
+        'anzahl_pokemon', (select count(*) from per_pokemon),
+        'pokemon_besitz', (select count(*) from per_pokemon where any_owned),
+        'gesamtwert',     (select coalesce(sum(price), 0) from f),
+        'min_pro_gruppe', (select coalesce(sum(lo), 0) from per_pokemon),
+        'max_pro_gruppe', (select coalesce(sum(hi), 0) from per_pokemon),
+        'latest_update',  (select max("update") from f)
+    );
+$$;
+
+grant execute on function public.catalog_stats(boolean, text[], text[], text[], text, numeric, numeric, integer, integer) to authenticated;
@@ -0,0 +1,72 @@
+-- Delta-Sync für user_cards: die App lädt den Besitz einmal komplett (seitenweise) und
+-- danach nur noch Änderungen seit ihrer Hochwassermarke (updated_at / deleted_at).
+-- Einmal im Supabase SQL-Editor ausführen. Ohne diese Migration lädt die App bei jedem
+-- Session-Start komplett (weiterhin seitenweise).
+--
+-- Annahme wie in catalog_cards.sql: user_cards.user ist die uuid aus auth.users.
+
+-- Zeitpunkt der letzten Änderung je Zeile (auch Upserts mit merge-duplicates)
+alter table public.user_cards
+    add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists user_cards_user_updated_at_idx
+    on public.user_cards ("user", updated_at);
+
+create or replace function public.user_cards_touch()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists user_cards_touch on public.user_cards;
+create trigger user_cards_touch
+    before insert or update on public.user_cards
+    for each row execute function public.user_cards_touch();
+
+-- Grabsteine gelöschter Karten (je user + karte_id höchstens einer)
+create table if not exists public.user_cards_deleted (
+    "user"     uuid        not null,
+    karte_id   text        not null,
+    deleted_at timestamptz not null default now(),
+    primary key ("user", karte_id)
+);
+
+create index if not exists user_cards_deleted_user_deleted_at_idx
+    on public.user_cards_deleted ("user", deleted_at);
+
+alter table public.user_cards_deleted enable row level security;
+
+drop policy if exists "eigene Grabsteine lesen" on public.user_cards_deleted;
+create policy "eigene Grabsteine lesen" on public.user_cards_deleted
+    for select to authenticated using ("user" = (select auth.uid()));
+
+-- Löschen legt einen Grabstein an, erneutes Hinzufügen entfernt ihn wieder
+create or replace function public.user_cards_tombstone()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op = 'DELETE' then
+        insert into user_cards_deleted ("user", karte_id, deleted_at)
+        values (old."user", old.karte_id, now())
+        on conflict ("user", karte_id) do update set deleted_at = excluded.deleted_at;
+        return old;
+    end if;
+    delete from user_cards_deleted where "user" = new."user" and karte_id = new.karte_id;
+    return new;
+end;
+$$;
+
+drop trigger if exists user_cards_tombstone on public.user_cards;
+create trigger user_cards_tombstone
+    after insert or delete on public.user_cards
+    for each row execute function public.user_cards_tombstone();
+
+-- Alte Grabsteine aufräumen (Sessions holen Deltas nur über kurze Zeiträume), z.B. per pg_cron:
+-- delete from public.user_cards_deleted where deleted_at < now() - interval '30 days';
@@ -0,0 +1,72 @@
+"""
+Lädt den Katalog in die Supabase-Tabelle catalog_cards (supabase/catalog_cards.sql),
+die die App im Modus SERVER_FILTERING=1 für Besitz-Filter und Kennzahlen nutzt.
+
+Braucht SUPABASE_URL und SUPABASE_SERVICE_ROLE_KEY (Schreiben an RLS vorbei):
+    python upload_catalog.py [--chunk 500]
+Idempotent (Upsert per karte_id) -> nach jedem Katalog-/Preis-Update einfach erneut ausführen.
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+import requests
+
+from catalog import read_catalog
+
+UPLOAD_COLUMNS = [
+    "karte_id", "generation", "set_name", "card_number", "pokemon_id",
+    "pokemon_name", "price", "rarity", "update",
+]
+UPLOAD_CHUNK = 500
+
+
+def catalog_rows(df: pd.DataFrame) -> list[dict]:
+    """Katalog -> JSON-Zeilen für PostgREST (eine Zeile je karte_id, die letzte gewinnt)."""
+    rows = df.drop_duplicates("karte_id", keep="last")[UPLOAD_COLUMNS].to_dict("records")
+    for row in rows:
+        for col, value in row.items():
+            if pd.isna(value):
+                row[col] = None
+            elif col == "update":
+                row[col] = value.date().isoformat()
+            elif col == "pokemon_id":
+                row[col] = int(value)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Katalog nach Supabase (catalog_cards) hochladen")
+    parser.add_argument("--chunk", type=int, default=UPLOAD_CHUNK)
+    args = parser.parse_args()
+
+    url = os.environ.get("SUPABASE_URL", "").rstrip("/")
+    key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
+    if not url or not key:
+        print("SUPABASE_URL und SUPABASE_SERVICE_ROLE_KEY müssen gesetzt sein.")
+        sys.exit(1)
+
+    headers = {
+        "apikey": key,
+        "Authorization": f"Bearer {key}",
+        "Content-Type": "application/json",
+        "Prefer": "resolution=merge-duplicates,return=minimal",
+    }
+    rows = catalog_rows(read_catalog())
+    with requests.Session() as session:
+        for i in range(0, len(rows), args.chunk):
+            chunk = rows[i : i + args.chunk]
+            r = session.post(
+                f"{url}/rest/v1/catalog_cards",
+                headers=headers,
+                params={"on_conflict": "karte_id"},
+                json=chunk,
+                timeout=60,
+            )
+            r.raise_for_status()
+            print(f"{i + len(chunk)}/{len(rows)} Karten hochgeladen", flush=True)
+
+
+if __name__ == "__main__":
+    main()